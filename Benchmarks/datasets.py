@@ -0,0 +1,84 @@
+import random
+from datetime import datetime as dt, timedelta, timezone
+
+workflow_states = ["unsubmitted", "submitted", "graded"]
+submission_states = ["CREATED", "TURNED_IN", "RETURNED"]
+
+def description(rng):
+    paragraphs = [
+        f"<p>Paragraph {index} with <b>bold</b>, <a href=\"https://example.com/{index}\">links</a> and {'text ' * rng.randint(5, 60)}</p>"
+        for index in range(rng.randint(0, 8))
+    ]
+    return f"<div>{''.join(paragraphs)}</div>" if paragraphs else None
+
+def due_date(rng, now):
+    return now + timedelta(days=rng.randint(-60, 60), hours=rng.randint(0, 23))
+
+def canvas_dataset(rng, now, instances, courses, assignments):
+    dataset = []
+
+    for instance in range(instances):
+        instance_courses = []
+
+        for course in range(courses):
+            course_id = instance * 100000 + course * 1000
+            instance_courses.append({
+                "id": course_id,
+                "name": f"Canvas Course {instance}-{course}",
+                "course_code": f"CV{instance}-{course}",
+                "assignments": [
+                    {
+                        "id": course_id + assignment,
+                        "name": f"Assignment {assignment}",
+                        "due_at": due_date(rng, now).strftime("%Y-%m-%dT%H:%M:%SZ") if rng.random() > 0.1 else None,
+                        "description": description(rng),
+                        "html_url": f"https://canvas.example.com/courses/{course_id}/assignments/{course_id + assignment}",
+                        "workflow_state": rng.choice(workflow_states)
+                    } for assignment in range(assignments)
+                ]
+            })
+
+        dataset.append({"courses": instance_courses})
+
+    return dataset
+
+def classroom_dataset(rng, now, courses, course_work):
+    dataset = []
+
+    for course in range(courses):
+        course_id = str(900000 + course)
+        items = []
+
+        for item in range(course_work):
+            due = due_date(rng, now)
+            items.append({
+                "id": f"{course_id}{item:04d}",
+                "title": f"Classroom Work {item}",
+                "dueDate": {"year": due.year, "month": due.month, "day": due.day},
+                "dueTime": {"hours": due.hour, "minutes": 0},
+                "alternateLink": f"https://classroom.example.com/c/{course_id}/a/{item}",
+                "submissions": [
+                    {
+                        "state": rng.choice(submission_states),
+                        "updateTime": (due - timedelta(hours=rng.randint(1, 48))).strftime("%Y-%m-%dT%H:%M:%SZ")
+                    }
+                ] if rng.random() > 0.2 else []
+            })
+
+        dataset.append({
+            "id": course_id,
+            "name": f"Classroom Course {course}",
+            "alternateLink": f"https://classroom.example.com/c/{course_id}",
+            "courseWork": items
+        })
+
+    return dataset
+
+def generate(instances=2, courses=5, assignments=20, classroom_courses=5, classroom_work=10, seed=0):
+    rng = random.Random(seed)
+    now = dt.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+    return {
+        "canvas": canvas_dataset(rng, now, instances, courses, assignments),
+        "classroom": classroom_dataset(rng, now, classroom_courses, classroom_work)
+    }
@@ -0,0 +1,101 @@
+import argparse
+import base64
+import json
+import multiprocessing
+import tempfile
+import threading
+import time
+from urllib.request import urlopen, Request
+from Benchmarks.datasets import generate
+from Benchmarks.servers import serve, default_notion_rate
+from Benchmarks.run import free_port, wait_for_server, server_request, write_config, run_once, targets, print_report
+from Utils.webhooks import WebhookReceiver
+from main import Config
+
+def post(url, payload):
+    urlopen(Request(url, data=json.dumps(payload).encode(), method="POST", headers={"Content-Type": "application/json"})).read()
+
+def canvas_event(course, assignment):
+    return {
+        "metadata": {"event_name": "submission_updated", "context_type": "Course", "context_id": str(course['id'])},
+        "body": {"assignment_id": str(assignment['id'])}
+    }
+
+def classroom_event(course, item):
+    notification = {
+        "collection": "courses.courseWork.studentSubmissions",
+        "eventType": "MODIFIED",
+        "resourceId": {"courseId": course['id'], "courseWorkId": item['id'], "id": f"submission-{item['id']}"}
+    }
+    return {"message": {"data": base64.b64encode(json.dumps(notification).encode()).decode()}, "subscription": "benchmark"}
+
+def main():
+    parser = argparse.ArgumentParser(description="Send bursts of Canvas and Classroom webhook events to the receiver after a full sync")
+    parser.add_argument("--instances", type=int, default=2)
+    parser.add_argument("--courses", type=int, default=5)
+    parser.add_argument("--assignments", type=int, default=20)
+    parser.add_argument("--classroom-courses", type=int, default=5)
+    parser.add_argument("--classroom-work", type=int, default=10)
+    parser.add_argument("--events", type=int, default=10, help="distinct assignments touched per service")
+    parser.add_argument("--repeat", type=int, default=5, help="events sent for each touched assignment")
+    parser.add_argument("--debounce", type=float, default=1)
+    parser.add_argument("--client-rate", type=float, default=default_notion_rate)
+    args = parser.parse_args()
+
+    options = {
+        "instances": args.instances,
+        "courses": args.courses,
+        "assignments": args.assignments,
+        "classroom_courses": args.classroom_courses,
+        "classroom_work": args.classroom_work
+    }
+    dataset = generate(**options)
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = multiprocessing.Process(target=serve, args=(port, options, default_notion_rate), daemon=True)
+    server.start()
+    wait_for_server(base_url)
+
+    with tempfile.TemporaryDirectory() as directory:
+        config = Config(write_config(directory, base_url, args))
+        receiver_port = free_port()
+        config.get_data()["Webhooks"] = {"port": receiver_port, "debounce-seconds": args.debounce}
+
+        run_once(config, list(targets))
+        server_request(base_url, "/__reset")
+
+        stop_event = threading.Event()
+        receiver = WebhookReceiver(config, stop_event, ("benchmark-classroom-token", "benchmark"))
+        thread = threading.Thread(target=receiver.run)
+        thread.start()
+
+        canvas_events = [
+            (f"http://127.0.0.1:{receiver_port}/canvas/{instance}", canvas_event(course, assignment))
+            for instance, canvas in enumerate(dataset["canvas"])
+            for course in canvas["courses"]
+            for assignment in course["assignments"]
+        ][:args.events]
+        classroom_events = [
+            (f"http://127.0.0.1:{receiver_port}/classroom", classroom_event(course, item))
+            for course in dataset["classroom"]
+            for item in course["courseWork"]
+        ][:args.events]
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for url, payload in canvas_events + classroom_events:
+                post(url, payload)
+
+        time.sleep(args.debounce + 1.5)
+        stop_event.set()
+        thread.join()
+        elapsed = time.perf_counter() - started
+
+        print(f"Sent {(len(canvas_events) + len(classroom_events)) * args.repeat} events for {len(canvas_events) + len(classroom_events)} assignments")
+        print_report("webhooks", elapsed, 0, server_request(base_url, "/__stats"))
+
+    server.terminate()
+
+if __name__ == "__main__":
+    main()
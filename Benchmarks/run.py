@@ -0,0 +1,184 @@
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+import time
+import tracemalloc
+from urllib.request import urlopen, Request
+from urllib.error import URLError
+from Benchmarks.servers import serve, default_notion_rate
+from main import Config
+from Utils.writer import NotionWriter
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for_server(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return urlopen(f"{base_url}/__stats").read()
+        except URLError:
+            time.sleep(0.1)
+    raise Exception("Benchmark servers did not start")
+
+def server_request(base_url, path):
+    return json.loads(urlopen(Request(f"{base_url}{path}", method="POST" if path == "/__reset" else "GET")).read())
+
+def write_config(directory, base_url, args):
+    data = {
+        "Canvas": [
+            {
+                "canvas-api-url": f"{base_url}/canvas/{instance}",
+                "canvas-api-token": f"canvas-token-{instance}",
+                "excluded-course-codes": []
+            } for instance in range(args.instances)
+        ],
+        "Google_Classroom": {
+            "client_secret_file": "client_secret.json",
+            "api-url": f"{base_url}/classroom/v1"
+        },
+        "Notion": {
+            "Notion-API-Key": "benchmark-notion-key",
+            "parent-page-id": "benchmark-parent",
+            "api-url": f"{base_url}/notion/v1",
+            "requests-per-second": args.client_rate,
+            "state-file": os.path.join(directory, "sync_state.db")
+        },
+        "HTTP-Cache": {
+            "directory": os.path.join(directory, "http_cache")
+        },
+        "Metrics": {
+            "report-file": os.path.join(directory, "metrics.json")
+        }
+    }
+
+    filename = os.path.join(directory, "config.json")
+    with open(filename, "w") as f:
+        f.write(json.dumps(data, indent=2))
+    return filename
+
+def run_classroom(stop_event, config):
+    import Google_Classroom.main as classroom
+
+    with config.lock:
+        data = copy.deepcopy(config.get_data())
+    classroom.sync(data, "benchmark-classroom-token", "benchmark")
+
+def run_canvas(stop_event, config):
+    import Canvas.main as canvas
+
+    canvas.main(stop_event, config)
+
+def produce_classroom(stop_event, config, writer):
+    import Google_Classroom.main as classroom
+
+    with config.lock:
+        data = copy.deepcopy(config.get_data())
+    classroom.stream(data, "benchmark-classroom-token", "benchmark", writer)
+
+def produce_canvas(stop_event, config, writer):
+    import Canvas.main as canvas
+
+    canvas.produce(stop_event, config, writer)
+
+def run_once(config, integrations, single_writer=False):
+    stop_event = threading.Event()
+    writer = None
+
+    if single_writer:
+        import Canvas.main as canvas
+        import Google_Classroom.main as classroom
+
+        with config.lock:
+            data = copy.deepcopy(config.get_data())
+        writer = NotionWriter(data, {
+            module.integration_title: module.id_property
+            for name, module in [("Canvas", canvas), ("Google_Classroom", classroom)] if name in integrations
+        }).start()
+        threads = [threading.Thread(target=producers[name], args=(stop_event, config, writer)) for name in integrations]
+    else:
+        threads = [threading.Thread(target=targets[name], args=(stop_event, config)) for name in integrations]
+
+    tracemalloc.start()
+    started = time.perf_counter()
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if writer:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+targets = {"Canvas": run_canvas, "Google_Classroom": run_classroom}
+producers = {"Canvas": produce_canvas, "Google_Classroom": produce_classroom}
+
+def print_report(run, elapsed, peak, stats):
+    print(f"\nRun {run}: {elapsed:.2f}s wall, {peak / 1024 / 1024:.1f} MB peak traced memory, {stats['throttled']} Notion 429s")
+    for endpoint, count in sorted(stats["requests"].items()):
+        print(f"  {count:>7}  {stats['bytes'][endpoint] / 1024:>10.1f} KB  {endpoint}")
+    print(f"  {sum(stats['requests'].values()):>7}  total requests")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a sync run against local service stand-ins")
+    parser.add_argument("--instances", type=int, default=2)
+    parser.add_argument("--courses", type=int, default=5)
+    parser.add_argument("--assignments", type=int, default=20)
+    parser.add_argument("--classroom-courses", type=int, default=5)
+    parser.add_argument("--classroom-work", type=int, default=10)
+    parser.add_argument("--notion-rate", type=float, default=default_notion_rate, help="requests per second the Notion stand-in allows before answering 429")
+    parser.add_argument("--client-rate", type=float, default=default_notion_rate, help="requests-per-second configured for the Notion client")
+    parser.add_argument("--runs", type=int, default=2, help="consecutive runs sharing state and caches")
+    parser.add_argument("--skip", choices=["Canvas", "Google_Classroom"], action="append", default=[])
+    parser.add_argument("--single-writer", action="store_true", help="feed both integrations into one Notion writer, as main.py does")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    options = {
+        "instances": args.instances,
+        "courses": args.courses,
+        "assignments": args.assignments,
+        "classroom_courses": args.classroom_courses,
+        "classroom_work": args.classroom_work
+    }
+
+    server = multiprocessing.Process(target=serve, args=(port, options, args.notion_rate), daemon=True)
+    server.start()
+    wait_for_server(base_url)
+
+    integrations = [name for name in targets if name not in args.skip]
+    report = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        config = Config(write_config(directory, base_url, args))
+
+        for run in range(1, args.runs + 1):
+            server_request(base_url, "/__reset")
+            elapsed, peak = run_once(config, integrations, args.single_writer)
+            stats = server_request(base_url, "/__stats")
+
+            print_report(run, elapsed, peak, stats)
+            report.append({"run": run, "wall_seconds": elapsed, "peak_memory_bytes": peak, **stats})
+
+    server.terminate()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            f.write(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
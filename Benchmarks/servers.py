@@ -0,0 +1,432 @@
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, urlencode
+from Benchmarks.datasets import generate
+
+default_port = 8765
+default_notion_rate = 30
+notion_page_size = 100
+classroom_page_size = 20
+
+id_segment = re.compile(r"^(\d+|[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}|[0-9a-f]{32})$")
+
+def endpoint_name(method, path):
+    segments = ["{id}" if id_segment.match(segment) else segment for segment in path.strip("/").split("/")]
+    if segments and segments[0] == "canvas" and len(segments) > 1:
+        segments[1] = "{instance}"
+    return f"{method} /{'/'.join(segments)}"
+
+def stored_text(value):
+    return [
+        {
+            "type": "text",
+            "text": item.get("text", {}),
+            "plain_text": item.get("text", {}).get("content", "")
+        } for item in value
+    ]
+
+def stored_value(prop):
+    if not prop:
+        return None
+
+    value = prop.get(prop["type"])
+    if prop["type"] in ["title", "rich_text"]:
+        return "".join(item["plain_text"] for item in value or []) or None
+    if prop["type"] == "select":
+        return value.get("name") if value else None
+    if prop["type"] == "date":
+        return parse_date(value["start"]) if value and value.get("start") else None
+    return value
+
+def parse_date(value):
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+filter_operators = {
+    "is_empty": lambda value, arg: value is None,
+    "is_not_empty": lambda value, arg: value is not None,
+    "equals": lambda value, arg: value == arg,
+    "does_not_equal": lambda value, arg: value != arg,
+    "before": lambda value, arg: value is not None and value < parse_date(arg),
+    "after": lambda value, arg: value is not None and value > parse_date(arg),
+    "on_or_before": lambda value, arg: value is not None and value <= parse_date(arg),
+    "on_or_after": lambda value, arg: value is not None and value >= parse_date(arg)
+}
+
+def matches(page, condition):
+    if "and" in condition:
+        return all(matches(page, item) for item in condition["and"])
+    if "or" in condition:
+        return any(matches(page, item) for item in condition["or"])
+
+    kind = next(key for key in condition if key != "property")
+    operator, arg = next(iter(condition[kind].items()))
+    return filter_operators[operator](stored_value(page["properties"].get(condition["property"])), arg)
+
+def sort_pages(pages, sorts):
+    for sort in reversed(sorts):
+        present = [page for page in pages if stored_value(page["properties"].get(sort["property"])) is not None]
+        missing = [page for page in pages if stored_value(page["properties"].get(sort["property"])) is None]
+        present.sort(key=lambda page: stored_value(page["properties"][sort["property"]]), reverse=sort.get("direction") == "descending")
+        pages = present + missing
+    return pages
+
+class NotionStore:
+    def __init__(self):
+        self.databases = {}
+        self.pages = {}
+        self.lock = threading.Lock()
+
+    def schema(self, properties, existing=None):
+        schema = dict(existing or {})
+
+        for name, prop in properties.items():
+            kind = next(key for key in prop if key not in ["id", "name", "type"])
+            value = prop[kind]
+
+            if name in schema and kind == "select":
+                names = {option['name'] for option in schema[name]["select"].get("options", [])}
+                schema[name]["select"].setdefault("options", []).extend(
+                    option for option in value.get("options", []) if option['name'] not in names
+                )
+                continue
+
+            schema[name] = {"id": schema.get(name, {}).get("id") or uuid.uuid4().hex[:4], "name": name, "type": kind, kind: value}
+
+        return schema
+
+    def page_properties(self, database, properties):
+        stored = {}
+
+        for name, prop in properties.items():
+            if name not in database["properties"]:
+                raise ValueError(f"{name} is not a property that exists.")
+
+            kind = database["properties"][name]["type"]
+            value = prop[kind]
+
+            if kind in ["title", "rich_text"]:
+                value = stored_text(value)
+            if kind == "select" and value:
+                options = database["properties"][name]["select"].setdefault("options", [])
+                if value['name'] not in [option['name'] for option in options]:
+                    options.append({"name": value['name']})
+
+            stored[name] = {"id": database["properties"][name]["id"], "type": kind, kind: value}
+
+        return stored
+
+class MockServices:
+    def __init__(self, dataset, notion_rate=default_notion_rate):
+        self.dataset = dataset
+        self.notion = NotionStore()
+        self.notion_rate = notion_rate
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = Counter()
+            self.bytes_sent = Counter()
+            self.throttled = 0
+            self.tokens = self.notion_rate
+            self.updated = time.monotonic()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "bytes": dict(self.bytes_sent),
+                "throttled": self.throttled
+            }
+
+    def record(self, endpoint, size):
+        with self.lock:
+            self.requests[endpoint] += 1
+            self.bytes_sent[endpoint] += size
+
+    def allow_notion_request(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.notion_rate, self.tokens + (now - self.updated) * self.notion_rate)
+            self.updated = now
+
+            if self.tokens < 1:
+                self.throttled += 1
+                return False
+            self.tokens -= 1
+            return True
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def services(self):
+        return self.server.services
+
+    def body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def respond(self, status, payload=None, headers=None, endpoint=None):
+        body = b"" if payload is None else json.dumps(payload).encode()
+        etag = f"\"{hashlib.sha1(body).hexdigest()}\"" if status == 200 and self.command == "GET" else None
+
+        if etag and self.headers.get("If-None-Match") == etag:
+            status = 304
+            body = b""
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+        if endpoint:
+            self.services.record(endpoint, len(body))
+
+    def dispatch(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        segments = url.path.strip("/").split("/")
+        endpoint = endpoint_name(self.command, url.path)
+        body = self.body()
+
+        try:
+            if url.path == "/__stats":
+                return self.respond(200, self.services.stats())
+            if url.path == "/__reset":
+                self.services.reset()
+                return self.respond(200, {})
+            if segments[0] == "canvas":
+                return self.canvas(segments[1:], query, endpoint)
+            if segments[0] == "classroom":
+                return self.classroom(segments[2:], query, endpoint)
+            if segments[0] == "notion":
+                if not self.services.allow_notion_request():
+                    return self.respond(429, {"object": "error", "code": "rate_limited"}, {"Retry-After": "1"}, endpoint)
+                return self.notion(segments[2:], query, body, endpoint)
+        except (KeyError, IndexError, ValueError) as e:
+            return self.respond(400, {"object": "error", "message": str(e)}, endpoint=endpoint)
+
+        self.respond(404, {"object": "error"}, endpoint=endpoint)
+
+    do_GET = dispatch
+    do_POST = dispatch
+    do_PATCH = dispatch
+
+    def canvas_page(self, items, query, endpoint):
+        per_page = int(query.get("per_page", ["10"])[0])
+        page = int(query.get("page", ["1"])[0])
+        headers = {}
+
+        if page * per_page < len(items):
+            next_query = {key: value[0] for key, value in query.items()}
+            next_query["page"] = page + 1
+            headers["Link"] = f"<http://{self.headers['Host']}{urlsplit(self.path).path}?{urlencode(next_query)}>; rel=\"next\""
+
+        self.respond(200, items[(page - 1) * per_page:page * per_page], headers, endpoint)
+
+    def canvas(self, segments, query, endpoint):
+        instance = self.services.dataset["canvas"][int(segments[0])]
+        path = segments[3:]
+        courses = {course['id']: course for course in instance["courses"]}
+
+        if path == ["users", "self"]:
+            return self.respond(200, {"id": 1}, endpoint=endpoint)
+        if path == ["courses"]:
+            return self.canvas_page([
+                {"id": course['id'], "name": course['name'], "course_code": course['course_code']}
+                for course in instance["courses"]
+            ], query, endpoint)
+
+        course = courses[int(path[1])]
+        assignments = {assignment['id']: assignment for assignment in course["assignments"]}
+        if path[2:] == []:
+            return self.respond(200, {"id": course['id'], "name": course['name'], "course_code": course['course_code']}, endpoint=endpoint)
+        if path[2] == "assignments" and len(path) == 4:
+            assignment = assignments[int(path[3])]
+            return self.respond(200, {
+                **{key: value for key, value in assignment.items() if key != "workflow_state"},
+                **({"submission": {"workflow_state": assignment['workflow_state']}} if "submission" in query.get("include[]", []) else {})
+            }, endpoint=endpoint)
+
+        if path[2:] == ["assignments"]:
+            include_submission = "submission" in query.get("include[]", [])
+            return self.canvas_page([
+                {
+                    **{key: value for key, value in assignment.items() if key != "workflow_state"},
+                    **({"submission": {"workflow_state": assignment['workflow_state']}} if include_submission else {})
+                } for assignment in course["assignments"]
+            ], query, endpoint)
+        if path[2] == "assignments" and path[4] == "submissions":
+            return self.respond(200, {"workflow_state": assignments[int(path[3])]['workflow_state']}, endpoint=endpoint)
+
+        raise KeyError(self.path)
+
+    def classroom_page(self, items, key, query, endpoint):
+        start = int(query.get("pageToken", ["0"])[0])
+        payload = {key: items[start:start + classroom_page_size]}
+
+        if start + classroom_page_size < len(items):
+            payload["nextPageToken"] = str(start + classroom_page_size)
+
+        self.respond(200, payload, endpoint=endpoint)
+
+    def classroom(self, segments, query, endpoint):
+        courses = {course['id']: course for course in self.services.dataset["classroom"]}
+
+        if segments == ["courses"]:
+            return self.classroom_page([
+                {key: value for key, value in course.items() if key != "courseWork"}
+                for course in courses.values()
+            ], "courses", query, endpoint)
+
+        course = courses[segments[1]]
+        if segments[2:] == []:
+            return self.respond(200, {key: value for key, value in course.items() if key != "courseWork"}, endpoint=endpoint)
+        if segments[2:] == ["courseWork"]:
+            return self.classroom_page([
+                {key: value for key, value in item.items() if key != "submissions"}
+                for item in course["courseWork"]
+            ], "courseWork", query, endpoint)
+
+        items = {item['id']: item for item in course["courseWork"]}
+        if len(segments) == 4:
+            return self.respond(200, {key: value for key, value in items[segments[3]].items() if key != "submissions"}, endpoint=endpoint)
+        if segments[4:] == ["studentSubmissions"]:
+            return self.classroom_page(items[segments[3]]["submissions"], "studentSubmissions", query, endpoint)
+
+        raise KeyError(self.path)
+
+    def notion(self, segments, query, body, endpoint):
+        store = self.services.notion
+
+        with store.lock:
+            if segments == ["search"]:
+                return self.respond(200, {"results": [
+                    database for database in store.databases.values()
+                    if body.get("query", "") in database["title"][0]["text"]["content"] and not database["archived"]
+                ]}, endpoint=endpoint)
+
+            if segments == ["databases"] and self.command == "POST":
+                database = {
+                    "object": "database",
+                    "id": str(uuid.uuid4()),
+                    "title": body["title"],
+                    "properties": store.schema(body["properties"]),
+                    "archived": False
+                }
+                store.databases[database["id"]] = database
+                return self.respond(200, database, endpoint=endpoint)
+
+            if segments[0] == "databases" and len(segments) == 2:
+                database = store.databases[segments[1]]
+                if self.command == "PATCH":
+                    database["properties"] = store.schema(body.get("properties", {}), database["properties"])
+                return self.respond(200, database, endpoint=endpoint)
+
+            if segments[0] == "databases" and segments[2:] == ["query"]:
+                return self.notion_query(store, segments[1], body, query, endpoint)
+
+            if segments == ["pages"] and self.command == "POST":
+                database = store.databases[body["parent"]["database_id"]]
+                page = {
+                    "object": "page",
+                    "id": str(uuid.uuid4()),
+                    "parent": body["parent"],
+                    "properties": store.page_properties(database, body["properties"]),
+                    "archived": False
+                }
+                store.pages[page["id"]] = page
+                return self.respond(200, page, endpoint=endpoint)
+
+            if segments[0] == "pages" and self.command == "PATCH":
+                page = store.pages.get(segments[1])
+                if not page or page["archived"]:
+                    return self.respond(404, {"object": "error", "code": "object_not_found"}, endpoint=endpoint)
+
+                database = store.databases[page["parent"]["database_id"]]
+                page["properties"].update(store.page_properties(database, body.get("properties", {})))
+                page["archived"] = body.get("archived", page["archived"])
+                return self.respond(200, page, endpoint=endpoint)
+
+        raise KeyError(self.path)
+
+    def notion_query(self, store, database_id, body, query, endpoint):
+        pages = [
+            page for page in store.pages.values()
+            if page["parent"]["database_id"] == database_id and not page["archived"]
+            and (not body.get("filter") or matches(page, body["filter"]))
+        ]
+        pages = sort_pages(pages, body.get("sorts", []))
+
+        start = int(body.get("start_cursor") or 0)
+        page_size = min(body.get("page_size", notion_page_size), notion_page_size)
+        selected = set(query.get("filter_properties", []))
+        results = [
+            {
+                **page,
+                "properties": {
+                    name: prop for name, prop in page["properties"].items()
+                    if not selected or prop["id"] in selected
+                }
+            } for page in pages[start:start + page_size]
+        ]
+        has_more = start + page_size < len(pages)
+
+        self.respond(200, {
+            "object": "list",
+            "results": results,
+            "has_more": has_more,
+            "next_cursor": str(start + page_size) if has_more else None
+        }, endpoint=endpoint)
+
+def start_server(dataset, port=default_port, notion_rate=default_notion_rate):
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.services = MockServices(dataset, notion_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def serve(port, options, notion_rate):
+    start_server(generate(**options), port, notion_rate)
+    threading.Event().wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve local Canvas, Classroom and Notion stand-ins")
+    parser.add_argument("--port", type=int, default=default_port)
+    parser.add_argument("--instances", type=int, default=2)
+    parser.add_argument("--courses", type=int, default=5)
+    parser.add_argument("--assignments", type=int, default=20)
+    parser.add_argument("--classroom-courses", type=int, default=5)
+    parser.add_argument("--classroom-work", type=int, default=10)
+    parser.add_argument("--notion-rate", type=float, default=default_notion_rate)
+    args = parser.parse_args()
+
+    print(f"Serving on http://127.0.0.1:{args.port} (canvas/<n>, classroom/v1, notion/v1)")
+    serve(args.port, {
+        "instances": args.instances,
+        "courses": args.courses,
+        "assignments": args.assignments,
+        "classroom_courses": args.classroom_courses,
+        "classroom_work": args.classroom_work
+    }, args.notion_rate)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import hashlib
+import multiprocessing
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from bs4 import BeautifulSoup as bs, FeatureNotFound
+
+default_parser = "html.parser"
+default_workers = 1
+default_cache_size = 5000
+max_description_length = 2000
+
+def html_to_text(description, parser=default_parser):
+    try:
+        soup = bs(description, parser)
+        text = soup.get_text(separator="\n").strip()
+    except TypeError:
+        text = description
+
+    if not text:
+        text = ""
+    return f"{text[0:max_description_length - 3]}..." if len(text) > max_description_length else text
+
+def available_parser(parser):
+    try:
+        bs("", parser)
+        return parser
+    except FeatureNotFound:
+        print(f"HTML parser {parser} is not installed, using {default_parser}")
+        return default_parser
+
+def description_key(description, parser):
+    return hashlib.sha256(f"{parser}:{description}".encode()).hexdigest()
+
+def convert_descriptions(descriptions, state, parser=default_parser, workers=default_workers, cache_size=default_cache_size):
+    parser = available_parser(parser)
+    pending = {
+        description_key(description, parser): description
+        for description in descriptions if description
+    }
+
+    texts = state.get_texts(list(pending))
+    missing = {key: description for key, description in pending.items() if key not in texts}
+
+    if workers > 1 and len(missing) > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            converted = dict(zip(missing, executor.map(html_to_text, missing.values(), repeat(parser))))
+    else:
+        converted = {key: html_to_text(description, parser) for key, description in missing.items()}
+
+    if converted:
+        state.set_texts(converted, cache_size)
+    texts.update(converted)
+
+    return {
+        description: texts[key] for key, description in pending.items()
+    }
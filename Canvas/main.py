@@ -1,10 +1,17 @@
 import requests as r
 import copy
-import json
 from datetime import datetime as dt, timezone
-from bs4 import BeautifulSoup as bs
-from Utils.notion import confirm_notion_database, list_db_items
+from Utils.reconcile import parse_time
+from Utils.writer import NotionWriter
+from Utils.schema import id_properties
+from Utils.http_cache import get_cache
+from Utils.metrics import instrumented_session
+from Utils.paginate import paginate, next_link
+from Utils.records import TaskRecord, iter_items
+from Utils.state import get_state
 import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
 
 integration_title = "Canvas"
 
@@ -16,300 +23,235 @@ canvas_defaults = {
     "excluded-course-codes": [],
 }
 
-expected_title = "School Tasks"
-
-database_format = {
-    "properties": {
-        "Name": {
-            "title": {}
-        },
-        "Due Date": {
-            "date": {}
-        },
-        "Description": {
-            "rich_text": {}
-        },
-        "Status": {
-            "select": {
-                "options": [
-                    {"name": "Not started", "color": "red"},
-                    {"name": "In progress", "color": "yellow"},
-                    {"name": "Submitted", "color": "blue"},
-                    {"name": "Graded", "color": "green"}
-                ]
-            }
-        },
-        "Course": {
-            "select": {
-                "options": [
-                ]
-            }
-        },
-        "Canvas-Assignment-ID": {
-            "rich_text": {}
-        },
-        "Link": {
-            "url": {}
-        }
-    }
-}
+default_concurrency = 4
 
-def get_assignments(course, user_id, api_key):
-    
-    response = r.get(f"{course['url']}/assignments?per_page=100", headers={
-        "Authorization": f"Bearer {api_key}",
-    })
-    
-    response.raise_for_status()
-    
-    assignments = []
+id_property = id_properties[integration_title]
+
+session = instrumented_session(integration_title.lower())
 
-    for assignment in response.json():
-        if not assignment.get('due_at'):
-            continue
+def get_paginated(url, api_key, params=None, cache=None):
 
-        submissions_response = r.get(f"{course['url']}/assignments/{assignment['id']}/submissions/{user_id}", headers={
+    def fetch(request):
+        url, params = request
+        if cache:
+            response = cache.get(session, url, api_key, params)
+        else:
+            response = session.get(url, headers={
                 "Authorization": f"Bearer {api_key}",
-            })
+            }, params=params)
 
-        submissions_response.raise_for_status()
-        submissions = submissions_response.json()
-        
+        response.raise_for_status()
+        return response
 
-        assignments.append({
-            "id": str(assignment['id']),
-            "name": assignment['name'],
-            "due_at": assignment['due_at'],
-            "description": assignment['description'],
-            "submitted": False,
-            "graded": False,
-            "course": course['name'],
-            "url": assignment.get('html_url', "")
-        })
+    return paginate(fetch, (url, params), next_link, lambda response: iter_items(response.content))
 
-        assignments[-1]['submitted'] = submissions.get('workflow_state') in ['submitted', 'graded']
-        assignments[-1]['graded'] = submissions.get('workflow_state') == 'graded'
+def get_submission(course, assignment, user_id, api_key):
+    submissions_response = session.get(f"{course['url']}/assignments/{assignment['id']}/submissions/{user_id}", headers={
+            "Authorization": f"Bearer {api_key}",
+        })
 
-    return assignments
+    submissions_response.raise_for_status()
+    return submissions_response.json()
 
-def confirm_notion_database_wrapper(data, assignments):
-    
-    now = dt.now(timezone.utc)
+def get_assignments(course, user_id, api_key, cache=None):
     
-    new_assignments = [
-        assignment for assignment in assignments if dt.fromisoformat(assignment['due_at'].replace("Z", "+00:00")) >= now
+    try:
+        return format_assignments(get_paginated(f"{course['url']}/assignments", api_key, {
+            "per_page": 100,
+            "include[]": "submission"
+        }, cache), course, user_id, api_key)
+    except r.HTTPError as e:
+        if e.response is None or e.response.status_code not in [400, 404, 501]:
+            raise
+        print(f"Bulk submission listing unavailable for course {course['name']}, falling back to per-assignment requests")
+        return format_assignments(get_paginated(f"{course['url']}/assignments", api_key, {"per_page": 100}, cache), course, user_id, api_key)
+
+def format_assignments(assignments, course, user_id, api_key):
+    return [
+        format_assignment(course, assignment, user_id, api_key)
+        for assignment in assignments if assignment.get('due_at')
     ]
 
-    other_assignments = [
-        assignment for assignment in assignments if dt.fromisoformat(assignment['due_at'].replace("Z", "+00:00")) < now
-    ]
+def format_assignment(course, assignment, user_id, api_key):
+    if "submission" in assignment:
+        submissions = assignment['submission'] or {}
+    else:
+        submissions = get_submission(course, assignment, user_id, api_key)
+
+    workflow_state = submissions.get('workflow_state')
+
+    return TaskRecord(
+        str(assignment['id']),
+        assignment['name'],
+        assignment['due_at'],
+        course['name'],
+        assignment.get('html_url', ""),
+        "Graded" if workflow_state == 'graded' else "Submitted" if workflow_state == 'submitted' else "Not started",
+        assignment['description']
+    )
+
+def description_stage(data):
+    settings = data.get("Canvas-Descriptions", {})
+
+    def prepare(plan):
+        from Canvas.descriptions import convert_descriptions, html_to_text, default_parser, default_workers, default_cache_size
+
+        texts = convert_descriptions(
+            [record.description for record in plan.create],
+            get_state(data),
+            settings.get("parser", default_parser),
+            settings.get("workers", default_workers),
+            settings.get("cache-size", default_cache_size)
+        )
 
-    courses = [
-        {"name": name}
-        for name in {assignment['course'] for assignment in new_assignments}
-    ]
-    
+        for record in plan.create:
+            description = record.description
+            record.description = texts[description] if description in texts else html_to_text(description)
 
-    special_properties = {
-        "Course": courses,
-        "Status": [
-            {"name": "Not started", "color": "red"},
-            {"name": "In progress", "color": "yellow"},
-            {"name": "Submitted", "color": "blue"},
-            {"name": "Graded", "color": "green"}
-        ]
-    }
-    
-    id, properties = confirm_notion_database(data, expected_title, database_format, special_properties)
+    return prepare
 
-    return (id, properties, new_assignments, other_assignments)
-        
-def update_notion(assignments, data):
+def submit(records, data, writer):
     
-    id, base_properties, new_assignments, other_assignments = confirm_notion_database_wrapper(data, assignments)
-    items = list_db_items(id, data['Notion']['Notion-API-Key'])
-
-    existing_items = [
-        item['properties']["Canvas-Assignment-ID"]["rich_text"][0]["text"]["content"] for item in items
-        if item['properties']["Canvas-Assignment-ID"]["rich_text"]
-    ]
+    now = dt.now(timezone.utc)
+    for record in records:
+        record.creatable = parse_time(record.due_at) >= now
+        if not record.creatable:
+            record.description = None
+
+    writer.submit(
+        integration_title,
+        records,
+        {record.course for record in records if record.creatable},
+        description_stage(data)
+    )
+
+def stream(data, writer):
+    scrape_assignments(data, lambda assignments: submit(assignments, data, writer))
+
+def get_user_id(canvas, cache=None):
+    if cache:
+        user_response = cache.get(session, f"{canvas['canvas-api-url']}/api/v1/users/self", canvas['canvas-api-token'])
+    else:
+        user_response = session.get(f"{canvas['canvas-api-url']}/api/v1/users/self", headers={
+            "Authorization": f"Bearer {canvas['canvas-api-token']}",
+        })
     
-    for assignment in new_assignments:
+    user_response.raise_for_status()
+    return user_response.json()['id']
 
-        if assignment['id'] in existing_items:
-            continue
+def get_courses(canvas, cache=None):
+    
+    course_list = get_paginated(f"{canvas['canvas-api-url']}/api/v1/courses", canvas['canvas-api-token'], {
+        "per_page": 100,
+        "enrollment_state": "active"
+    }, cache)
+    
+    user_id = get_user_id(canvas, cache)
+    
+    courses = []
+    
+    for course in course_list:
         
-        time = dt.fromisoformat(assignment['due_at'].replace("Z", "+00:00"))
-
         try:
-            soup = bs(assignment.get("description", ""), "html.parser")
-            text = soup.get_text(separator="\n").strip()
-        except TypeError:
-            text = assignment.get("description", "")
-
-        if not text:
-            text = ""
-        text = f"{text[0:1997]}..." if len(text) > 2000 else text
-
-        properties = {}
-        properties.update({
-            "Description": {
-                "rich_text": [
-                    {
-                        "text": {
-                            "content": text
-                        }
-                    }
-                ]
-            },
-            "Due Date": {
-                "date": {
-                    "start": time.isoformat(timespec='milliseconds'),
-                    "end": None,
-                    "time_zone": None
-                }
-            },
-            "Status": {
-                "select": {
-                    "name": "Graded" if assignment['graded'] else "Submitted" if assignment['submitted'] else "Not started"
-                }
-            },
-            "Course": {
-                "select": {
-                    "name": assignment['course']
-                }
-            },
-            "Canvas-Assignment-ID": {
-                "rich_text": [
-                    {
-                        "text": {
-                            "content": assignment['id']
-                        }
-                    }
-                ]
-            },
-            "Name": {
-                "title": [
-                    {
-                        "text": {
-                            "content": assignment['name']
-                        }
-                    }
-                ]
-            },
-            "Link": {
-                "url": assignment['url']
-            }
-        })
-        
-        response = r.post(
-            "https://api.notion.com/v1/pages",
-            headers = {
-                'Authorization': f"Bearer {data['Notion']['Notion-API-Key']}",
-                'Content-Type': 'application/json',
-                'Notion-Version': '2022-06-28'
-            },
-            json = {
-                "parent": {
-                    "database_id": id
-                },
-                "properties": properties
-            }
-        )
-        
-        if response.status_code != 200:
-            print(response.text)
-            print(json.dumps(properties, indent=4))
+            if course['course_code'] in canvas["excluded-course-codes"]:
+                continue
+            
+            courses.append({
+                "id": course['id'],
+                "name": course['name'],
+                "url": f"{canvas['canvas-api-url']}/api/v1/courses/{course['id']}"
+            })
+        except KeyError as e:
+            pass
+
+    return user_id, courses
+
+def sync_assignments(canvas, course_id, assignment_ids, data, writer):
+    api_key = canvas['canvas-api-token']
+    cache = get_cache(data)
+
+    try:
+        user_id = get_user_id(canvas, cache)
+        response = cache.get(session, f"{canvas['canvas-api-url']}/api/v1/courses/{course_id}", api_key)
         response.raise_for_status()
+        course = response.json()
 
-    new_assignments.extend(other_assignments)
-    assignment_map = {
-        assignment['id']: assignment for assignment in new_assignments
-    }
-
-    for assignment in items:
-        if not assignment['properties']["Canvas-Assignment-ID"]["rich_text"]:
-            continue
-        assignment_details = assignment_map.get(assignment['properties']["Canvas-Assignment-ID"]["rich_text"][0]["text"]["content"])
-        if not assignment_details:
-            continue
-
-        time = dt.fromisoformat(assignment_details['due_at'].replace("Z", "+00:00"))
-        old_status = assignment['properties']["Status"]["select"]["name"]
-
-        if assignment_details['graded']:
-            new_status = "Graded"
-        elif assignment_details['submitted']:
-            new_status = "Submitted"
-        else:
-            new_status = old_status
-
-        r.patch(f"https://api.notion.com/v1/pages/{assignment['id']}",
-            headers = {
-                'Authorization': f"Bearer {data['Notion']['Notion-API-Key']}",
-                'Content-Type': 'application/json',
-                'Notion-Version': '2022-06-28'
-            },
-            json= {
-            "properties": {
-                "Due Date": {
-                    "date": {
-                        "start": time.isoformat(timespec='milliseconds'),
-                        "end": None,
-                        "time_zone": None
-                    }
-                },
-                "Status": {
-                    "select": {
-                        "name": new_status
-                    }
-                },
-                "Link": {
-                    "url": assignment_details['url']
-                }
-            }
-        })
+        if course.get('course_code') in canvas["excluded-course-codes"]:
+            return
 
-def scrape_assignments(data):
+        course = {
+            "id": course['id'],
+            "name": course['name'],
+            "url": f"{canvas['canvas-api-url']}/api/v1/courses/{course['id']}"
+        }
+        assignments = []
+
+        for assignment_id in assignment_ids:
+            response = cache.get(session, f"{course['url']}/assignments/{assignment_id}", api_key, {"include[]": "submission"})
+            response.raise_for_status()
+            assignment = response.json()
+
+            if assignment.get('due_at'):
+                assignments.append(format_assignment(course, assignment, user_id, api_key))
+    finally:
+        cache.flush()
+
+    submit(assignments, data, writer)
+
+def scrape_course(course, user_id, canvas, cache=None):
+    print(f"Scraping Canvas assignments for course {course['name']}")
+    return get_assignments(course, user_id, canvas['canvas-api-token'], cache)
+
+def scrape_instance(canvas, cache=None, on_course=None):
+    
+    user_id, courses = get_courses(canvas, cache)
+    results = [[] for _ in courses]
+
+    concurrency = canvas.get("max-concurrency", default_concurrency)
+    remaining = iter(enumerate(courses))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(scrape_course, course, user_id, canvas, cache): index
+            for index, course in islice(remaining, concurrency)
+        }
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index = futures.pop(future)
+                try:
+                    if on_course:
+                        on_course(future.result())
+                    else:
+                        results[index] = future.result()
+                except Exception as e:
+                    print(f"Error scraping Canvas course {courses[index]['name']}: {e}")
+                    traceback.print_exc()
+
+                for next_index, course in islice(remaining, 1):
+                    futures[executor.submit(scrape_course, course, user_id, canvas, cache)] = next_index
+
+    return [assignment for result in results for assignment in result]
+
+def scrape_assignments(data, on_course=None):
     
     all_assignments = []
+    instances = data[integration_title]
+    cache = get_cache(data)
 
-    for canvas in data[integration_title]:
-        
-        response = r.get(f"{canvas['canvas-api-url']}/api/v1/courses?per_page=100&enrollment_state=active", headers={
-            "Authorization": f"Bearer {canvas['canvas-api-token']}",
-        })
-        
-        response.raise_for_status()
-        
-        user_response = r.get(f"{canvas['canvas-api-url']}/api/v1/users/self", headers={
-            "Authorization": f"Bearer {canvas['canvas-api-token']}",
-        })
-        
-        user_response.raise_for_status()
-        
-        user_id = user_response.json()['id']
-        
-        courses = []
-        
-        for course in response.json():
-            
-            try:
-                if course['course_code'] in canvas["excluded-course-codes"]:
-                    continue
-                
-                courses.append({
-                    "id": course['id'],
-                    "name": course['name'],
-                    "url": f"{canvas['canvas-api-url']}/api/v1/courses/{course['id']}"
-                })
-            except KeyError as e:
-                pass
-        
-        
-        for course in courses:
-            print(f"Scraping Canvas assignments for course {course['name']}")
-            all_assignments.extend(get_assignments(course, user_id, canvas['canvas-api-token']))
+    with ThreadPoolExecutor(max_workers=max(len(instances), 1)) as executor:
+        futures = [executor.submit(scrape_instance, canvas, cache, on_course) for canvas in instances]
+
+    for canvas, future in zip(instances, futures):
+        try:
+            all_assignments.extend(future.result())
+        except Exception as e:
+            print(f"Error scraping Canvas instance {canvas['canvas-api-url']}: {e}")
+            traceback.print_exc()
+
+    cache.flush()
             
     return all_assignments
 
@@ -331,7 +273,7 @@ def check_config(config):
             config.write_data()
             raise Exception("Canvas Configuration is Incomplete")
 
-def main(stop_event, config):
+def load_data(stop_event, config):
     try:
         check_config(config)
     except Exception as e:
@@ -342,7 +284,21 @@ def main(stop_event, config):
     if not stop_event.is_set():
         
         with config.lock:
-            data = copy.deepcopy(config.get_data())
-        
-        assignments = scrape_assignments(data)
-        update_notion(assignments, data)
+            return copy.deepcopy(config.get_data())
+
+def produce(stop_event, config, writer):
+    data = load_data(stop_event, config)
+
+    if data:
+        stream(data, writer)
+
+def main(stop_event, config):
+    data = load_data(stop_event, config)
+
+    if data:
+        writer = NotionWriter(data, {integration_title: id_property}).start()
+
+        try:
+            stream(data, writer)
+        finally:
+            writer.close()
@@ -1,16 +1,70 @@
-from google_auth_oauthlib.flow import InstalledAppFlow
-import requests as r
+import os
+import importlib.util
 import json
 from datetime import datetime as dt, timezone
-from Utils.notion import confirm_notion_database, list_db_items
-from Canvas.main import database_format, expected_title
+from Utils.reconcile import parse_time
+from Utils.writer import NotionWriter
+from Utils.schema import id_properties
+from Utils.http_cache import get_cache
+from Utils.metrics import metrics, instrumented_session
+from Utils.paginate import paginate, next_page_token
+from Utils.records import TaskRecord, read_page
 import copy
+import asyncio
+import time
 
 SCOPES = [
     "https://www.googleapis.com/auth/classroom.courses.readonly",
     "https://www.googleapis.com/auth/classroom.student-submissions.me.readonly"
 ]
 
+integration_title = "Google_Classroom"
+id_property = id_properties[integration_title]
+
+classroom_api_url = "https://classroom.googleapis.com/v1"
+default_concurrency = 8
+default_token_file = "token.json"
+
+session = instrumented_session("classroom")
+
+credentials = {}
+
+def save_credentials(creds, token_file):
+    with os.fdopen(os.open(token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+        f.write(creds.to_json())
+
+def get_credentials(data):
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+    from google.auth.exceptions import RefreshError
+    from google.oauth2.credentials import Credentials
+
+    settings = data['Google_Classroom']
+    token_file = settings.get("token_file", default_token_file)
+    creds = credentials.get(token_file)
+
+    if not creds and os.path.exists(token_file):
+        try:
+            creds = Credentials.from_authorized_user_file(token_file, SCOPES)
+        except ValueError as e:
+            print(f"Ignoring unreadable Google Classroom token file: {e}")
+
+    if creds and creds.expired and creds.refresh_token:
+        try:
+            creds.refresh(Request())
+            save_credentials(creds, token_file)
+        except RefreshError as e:
+            print(f"Google Classroom token could not be refreshed: {e}")
+            creds = None
+
+    if not creds or not creds.valid:
+        flow = InstalledAppFlow.from_client_secrets_file(settings['client_secret_file'], SCOPES)
+        creds = flow.run_local_server(port=0)
+        save_credentials(creds, token_file)
+
+    credentials[token_file] = creds
+    return creds
+
 def parse_due(due_date, due_time):
     year = due_date.get("year")
     month = due_date.get("month")
@@ -20,36 +74,22 @@ def parse_due(due_date, due_time):
     dt_obj = dt(year, month, day, hours, minutes, tzinfo=timezone.utc)
     return dt_obj.isoformat()
 
-def get_courses(token):
-    
-    next_page_token = None
-    first_page = True
-    courses = []
-    
-    while first_page or next_page_token:
-        
-        params = {
-            "studentId": "me",
-            "courseStates": "ACTIVE",
-        }
-        
-        if next_page_token:
-            params["pageToken"] = next_page_token
-        
-        response = r.get(
-            "https://classroom.googleapis.com/v1/courses",
-            headers = {
-                "Authorization": f"Bearer {token}",
-            },
-            params = params
-        )
-    
-        first_page = False
+def get_all(token, cache, identity, url, items_key, params=None):
+
+    def fetch(params):
+        response = cache.get(session, url, token, params, identity)
         response.raise_for_status()
-        response_json = response.json()
-        next_page_token = response_json.get("nextPageToken")
-        courses.extend(response_json.get("courses", []))
-        
+        return read_page(response.content, items_key)
+
+    return paginate(fetch, dict(params or {}), next_page_token, lambda page: page.get(items_key, []))
+
+def get_courses(token, cache, identity=None, api_url=classroom_api_url):
+    return format_courses(get_all(token, cache, identity, f"{api_url}/courses", "courses", {
+        "studentId": "me",
+        "courseStates": "ACTIVE",
+    }))
+
+def format_courses(courses):
     return [
         {
             "id": course['id'],
@@ -58,243 +98,236 @@ def get_courses(token):
         } for course in courses
     ]
 
-def get_course_work(token, course_id, course_name):
-    
-    next_page_token = None
-    first_page = True
+def format_course_work(course_work, course_name):
+    return [
+        TaskRecord(
+            item['id'],
+            item['title'],
+            parse_due(item.get('dueDate', {}), item.get('dueTime', {})),
+            course_name,
+            item['alternateLink']
+        ) for item in course_work
+    ]
+
+def submission_status(submission_list):
+    submission_list.sort(key=lambda x: dt.fromisoformat(x['updateTime'].replace("Z", "+00:00")))
     
-    course_work = []
+    status = "Not started"
+    if submission_list:
+        last_submission = submission_list[-1]
+        if last_submission['state'] == 'RETURNED':
+            status = "Graded"
+        elif last_submission['state'] == 'TURNED_IN':
+            status = "Submitted"
+        else:
+            status = "In progress"
 
-    while first_page or next_page_token:
-        response = r.get(
-            f"https://classroom.googleapis.com/v1/courses/{course_id}/courseWork",
-            headers = {
-                "Authorization": f"Bearer {token}",
-            }, params = {
-                "courseWorkStates": "PUBLISHED",
-            }
-        )
+    return status
+
+def get_course_work(token, course_id, course_name, cache, identity=None, api_url=classroom_api_url):
     
-        response.raise_for_status()
-        
-        first_page = False
-        response_json = response.json()
-        course_work.extend(response_json.get("courseWork", []))
-        next_page_token = response_json.get("nextPageToken")
+    course_work = format_course_work(get_all(token, cache, identity, f"{api_url}/courses/{course_id}/courseWork", "courseWork", {
+        "courseWorkStates": "PUBLISHED",
+    }), course_name)
+    
+    return get_statuses(token, course_id, course_work, cache, identity, api_url)
 
-    course_work = [
-        {
-            "courseId": course_id,
-            "courseName": course_name,
-            "id": item['id'],
-            "title": item['title'],
-            "due_at": parse_due(item.get('dueDate', {}), item.get('dueTime', {})),
-            "link": item['alternateLink']
-        } for item in course_work
-    ]
+def get_statuses(token, course_id, course_work, cache, identity=None, api_url=classroom_api_url):
     
     for course in course_work:
-        
-        first_page = True
-        next_page_token = None
-
-        submission_list = []
-
-        while first_page or next_page_token:
-            response = r.get(
-                f"https://classroom.googleapis.com/v1/courses/{course['courseId']}/courseWork/{course['id']}/studentSubmissions",
-                headers = {
-                    "Authorization": f"Bearer {token}",
-                    "userId": "me",
-                }
-            )
-            
-            response.raise_for_status()
-            response_json = response.json()
-            submission_list.extend(response_json.get("studentSubmissions", []))
-            next_page_token = response_json.get("nextPageToken")
-            first_page = False
-
-        submission_list.sort(key=lambda x: dt.fromisoformat(x['updateTime'].replace("Z", "+00:00")))
-        
-        status = "Not started"
-        if submission_list:
-            last_submission = submission_list[-1]
-            if last_submission['state'] == 'RETURNED':
-                status = "Graded"
-            elif last_submission['state'] == 'TURNED_IN':
-                status = "Submitted"
-            else:
-                status = "In progress"
-                
-        course['status'] = status
+        submission_list = list(get_all(
+            token,
+            cache,
+            identity,
+            f"{api_url}/courses/{course_id}/courseWork/{course.id}/studentSubmissions",
+            "studentSubmissions",
+            {"userId": "me"}
+        ))
+
+        course.status = submission_status(submission_list)
 
         #print(json.dumps(submission_list, indent=2))
 
     return course_work
 
-def confirm_notion_database_wrapper(data, courses):
-    
-    special_properties = {
-        "Course": [{"name": course['name']} for course in courses],
-        "Status": [
-            {"name": "Not started", "color": "red"},
-            {"name": "In progress", "color": "yellow"},
-            {"name": "Submitted", "color": "blue"},
-            {"name": "Graded", "color": "green"}
-        ]
-    }
-    
-    copied_database_format = copy.deepcopy(database_format)
-    copied_database_format['properties']['Google_Classroom_Assignment_Id'] = {
-            "rich_text": {}
-    }
+def get_item(token, cache, identity, url):
+    response = cache.get(session, url, token, None, identity)
+    response.raise_for_status()
+    return response.json()
 
-    id, properties = confirm_notion_database(data, expected_title, copied_database_format, special_properties)
+def sync_course_work(data, token, identity, course_id, course_work_ids, writer):
+    api_url = data['Google_Classroom'].get("api-url", classroom_api_url)
+    cache = get_cache(data)
 
-    return id, properties
+    try:
+        course = format_courses([get_item(token, cache, identity, f"{api_url}/courses/{course_id}")])[0]
+        items = [get_item(token, cache, identity, f"{api_url}/courses/{course_id}/courseWork/{course_work_id}") for course_work_id in course_work_ids]
 
-def upload_notion_pages(data, assignments, id):
-
-    items = list_db_items(id, data['Notion']['Notion-API-Key'])
-    
-    existing_items = [
-        item['properties']["Google_Classroom_Assignment_Id"]["rich_text"][0]["text"]["content"] for item in items
-        if item['properties']["Google_Classroom_Assignment_Id"]["rich_text"]
-    ]
-    
-    for assignment in assignments:
-        
-        if assignment['id'] in existing_items:
-            continue
-
-        if dt.fromisoformat(assignment['due_at'].replace("Z", "+00:00")) < dt.now(timezone.utc) and assignment['status'] != "Not started":
-            continue
-
-        properties = {}
-        properties.update({
-            "Due Date": {
-                "date": {
-                    "start": assignment['due_at'],
-                    "end": None,
-                    "time_zone": None
-                }
-            },
-            "Status": {
-                "select": {
-                    "name": assignment['status']
-                }
-            },
-            "Course": {
-                "select": {
-                    "name": assignment['courseName']
-                }
-            },
-            "Google_Classroom_Assignment_Id": {
-                "rich_text": [
-                    {
-                        "text": {
-                            "content": assignment['id']
-                        }
-                    }
-                ]
-            },
-            "Name": {
-                "title": [
-                    {
-                        "text": {
-                            "content": assignment['title']
-                        }
-                    }
-                ]
-            },
-            "Link": {
-                "url": assignment['link']
-            }
-        })
-        
-        response = r.post(
-            "https://api.notion.com/v1/pages",
-            headers = {
-                'Authorization': f"Bearer {data['Notion']['Notion-API-Key']}",
-                'Content-Type': 'application/json',
-                'Notion-Version': '2022-06-28'
-            },
-            json = {
-                "parent": {
-                    "database_id": id
-                },
-                "properties": properties
-            }
+        course_work = format_course_work(
+            [item for item in items if item.get("state", "PUBLISHED") == "PUBLISHED"],
+            course['name']
         )
-        
-        if response.status_code != 200:
-            print(response.text)
-            print(json.dumps(properties, indent=4))
-        response.raise_for_status()
+        course_work = get_statuses(token, course['id'], course_work, cache, identity, api_url)
+    finally:
+        cache.flush()
 
-    assignment_map = {
-        assignment['id']: assignment for assignment in assignments
-    }
-    
-    for item in items:
-        
-        if not item['properties']["Google_Classroom_Assignment_Id"]["rich_text"]:
-            continue
-        
-        assignment = assignment_map.get(item['properties']["Google_Classroom_Assignment_Id"]["rich_text"][0]["text"]["content"])
-        if not assignment:
-            continue
-        
-        
-
-        new_status = item['properties']['Status']['select']['name']
-        if assignment['status'] in ["Graded", "Submitted"]:
-            new_status = assignment['status']
-        
-        r.patch(f"https://api.notion.com/v1/pages/{item['id']}",
-            headers = {
-                'Authorization': f"Bearer {data['Notion']['Notion-API-Key']}",
-                'Content-Type': 'application/json',
-                'Notion-Version': '2022-06-28'
-            },
-            json= {
-            "properties": {
-                "Due Date": {
-                    "date": {
-                        "start": assignment['due_at'],
-                        "end": None,
-                        "time_zone": None
-                    }
-                },
-                "Status": {
-                    "select": {
-                        "name": new_status
-                    }
-                },
-                "Link": {
-                    "url": assignment['link']
-                }
-            }
-        })
+    submit([course], course_work, writer)
 
-def main(stop_event, config):
-    with config.lock:
-        data = copy.deepcopy(config.get_data())
-    flow = InstalledAppFlow.from_client_secrets_file(data['Google_Classroom']['client_secret_file'], SCOPES)
-    creds = flow.run_local_server(port=0)
-    token = creds.token
-    courses = get_courses(token)
+def scrape_course_work(token, cache, identity=None, api_url=classroom_api_url, on_course=None):
+    courses = get_courses(token, cache, identity, api_url)
     
     course_work = []
 
     for course in courses:
         #print(f"Course: {course['name']}")
-        course_assignments = get_course_work(token, course['id'], course['name'])
+        course_assignments = get_course_work(token, course['id'], course['name'], cache, identity, api_url)
         #print(f"Course Work: {json.dumps(course_assignments, indent=2)}")
-        course_work.extend(course_assignments)
+        if on_course:
+            on_course(course, course_assignments)
+        else:
+            course_work.extend(course_assignments)
+
+    return courses, course_work
+
+async def get_page_async(session, semaphore, cache, token, identity, url, items_key, params):
+    key = cache.key(url, identity or token, params)
+    conditional_headers = cache.conditional_headers(key) if cache.enabled else {}
+
+    async with semaphore:
+        started = time.perf_counter()
+        async with session.get(url, headers={"Authorization": f"Bearer {token}", **conditional_headers}, params=params) as response:
+            if response.status == 304:
+                metrics.record("classroom", "GET", url, response.status, time.perf_counter() - started, 0)
+                body, _ = cache.load(key)
+            else:
+                response.raise_for_status()
+                body = await response.read()
+                metrics.record("classroom", "GET", url, response.status, time.perf_counter() - started, len(body))
+                if cache.enabled:
+                    cache.store(key, response.headers, body)
+
+    if body is None:
+        return await get_page_async(session, semaphore, cache, token, identity, url, items_key, params)
+
+    return read_page(body, items_key)
+
+async def get_all_async(session, semaphore, cache, token, identity, url, items_key, params=None):
+    params = dict(params or {})
+    items = []
+
+    while True:
+        page = await get_page_async(session, semaphore, cache, token, identity, url, items_key, params)
 
-    id, properties = confirm_notion_database_wrapper(data, courses)
+        items.extend(page.get(items_key, []))
+        params = next_page_token(page, params)
+
+        if not params:
+            return items
+
+async def get_course_work_async(session, semaphore, cache, token, identity, api_url, course_id, course_name):
     
-    #print(json.dumps(course_work, indent=2))
-    upload_notion_pages(data, course_work, id)
\ No newline at end of file
+    course_work = format_course_work(await get_all_async(
+        session, semaphore, cache, token, identity,
+        f"{api_url}/courses/{course_id}/courseWork",
+        "courseWork",
+        {"courseWorkStates": "PUBLISHED"}
+    ), course_name)
+
+    submissions = await asyncio.gather(*[
+        get_all_async(
+            session, semaphore, cache, token, identity,
+            f"{api_url}/courses/{course_id}/courseWork/{item.id}/studentSubmissions",
+            "studentSubmissions",
+            {"userId": "me"}
+        ) for item in course_work
+    ])
+
+    for item, submission_list in zip(course_work, submissions):
+        item.status = submission_status(submission_list)
+
+    return course_work
+
+async def scrape_course_async(session, semaphore, slots, cache, token, identity, api_url, course):
+    await slots.acquire()
+    return course, await get_course_work_async(session, semaphore, cache, token, identity, api_url, course['id'], course['name'])
+
+async def scrape_course_work_async(token, concurrency, cache, identity=None, api_url=classroom_api_url, on_course=None):
+    import aiohttp
+
+    semaphore = asyncio.Semaphore(concurrency)
+    slots = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        courses = format_courses(await get_all_async(
+            session, semaphore, cache, token, identity,
+            f"{api_url}/courses",
+            "courses",
+            {"studentId": "me", "courseStates": "ACTIVE"}
+        ))
+
+        course_work = []
+
+        for result in asyncio.as_completed([
+            scrape_course_async(session, semaphore, slots, cache, token, identity, api_url, course)
+            for course in courses
+        ]):
+            try:
+                course, course_assignments = await result
+                if on_course:
+                    await asyncio.to_thread(on_course, course, course_assignments)
+                else:
+                    course_work.extend(course_assignments)
+            finally:
+                slots.release()
+
+    return courses, course_work
+
+def scrape(data, token, identity=None, on_course=None):
+    settings = data['Google_Classroom']
+    api_url = settings.get("api-url", classroom_api_url)
+    cache = get_cache(data)
+
+    try:
+        if settings.get("async", True):
+            if importlib.util.find_spec("aiohttp") is None:
+                print("aiohttp is not installed, scraping Google Classroom sequentially")
+            else:
+                return asyncio.run(scrape_course_work_async(
+                    token, settings.get("max-concurrency", default_concurrency), cache, identity, api_url, on_course
+                ))
+
+        return scrape_course_work(token, cache, identity, api_url, on_course)
+    finally:
+        cache.flush()
+
+def submit(courses, course_work, writer):
+
+    now = dt.now(timezone.utc)
+    for record in course_work:
+        record.creatable = parse_time(record.due_at) >= now or record.status == "Not started"
+
+    writer.submit(integration_title, course_work, [course['name'] for course in courses])
+
+def stream(data, token, identity, writer):
+    scrape(data, token, identity, lambda course, course_work: submit([course], course_work, writer))
+
+def sync(data, token, identity=None):
+    writer = NotionWriter(data, {integration_title: id_property}).start()
+
+    try:
+        stream(data, token, identity, writer)
+    finally:
+        writer.close()
+
+def produce(stop_event, config, writer):
+    with config.lock:
+        data = copy.deepcopy(config.get_data())
+    creds = get_credentials(data)
+    stream(data, creds.token, creds.refresh_token, writer)
+
+def main(stop_event, config):
+    with config.lock:
+        data = copy.deepcopy(config.get_data())
+    creds = get_credentials(data)
+    sync(data, creds.token, creds.refresh_token)
@@ -0,0 +1,161 @@
+import os
+import json
+import hashlib
+import threading
+import time
+
+default_cache_directory = ".http_cache"
+default_max_size_mb = 50
+eviction_target = 0.9
+
+class HTTPCache:
+    def __init__(self, directory=default_cache_directory, max_size_mb=default_max_size_mb, enabled=True):
+        self.directory = directory
+        self.max_bytes = max_size_mb * 1024 * 1024
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.index_file = os.path.join(directory, "index.json")
+        self.index = {}
+        self.total_bytes = 0
+        self.dirty = False
+
+        if not enabled:
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.index_file, "r") as f:
+                self.index = json.loads(f.read())
+        except (OSError, ValueError):
+            self.index = {}
+
+        self.total_bytes = sum(entry["size"] for entry in self.index.values())
+
+    def key(self, url, token, params=None):
+        params = sorted((params or {}).items())
+        return hashlib.sha256(json.dumps([url, params, token], default=str).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def conditional_headers(self, key):
+        with self.lock:
+            entry = self.index.get(key)
+
+        if not entry:
+            return {}
+
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last-modified"):
+            headers["If-Modified-Since"] = entry["last-modified"]
+        return headers
+
+    def load(self, key):
+        with self.lock:
+            entry = self.index.get(key)
+            if not entry:
+                return None, None
+            entry["accessed"] = time.time()
+            self.dirty = True
+
+        try:
+            with open(self.path(key), "rb") as f:
+                return f.read(), entry
+        except OSError:
+            with self.lock:
+                entry = self.index.pop(key, None)
+                if entry:
+                    self.total_bytes -= entry["size"]
+            return None, None
+
+    def store(self, key, headers, body):
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+
+        with open(self.path(key), "wb") as f:
+            f.write(body)
+
+        with self.lock:
+            previous = self.index.get(key)
+            if previous:
+                self.total_bytes -= previous["size"]
+
+            self.index[key] = {
+                "etag": etag,
+                "last-modified": last_modified,
+                "link": headers.get("Link"),
+                "size": len(body),
+                "accessed": time.time()
+            }
+            self.total_bytes += len(body)
+            self.dirty = True
+
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        for key, entry in sorted(self.index.items(), key=lambda item: item[1]["accessed"]):
+            if self.total_bytes <= self.max_bytes * eviction_target:
+                break
+            self.total_bytes -= entry["size"]
+            del self.index[key]
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def save(self):
+        temp_file = f"{self.index_file}.tmp"
+        with open(temp_file, "w") as f:
+            f.write(json.dumps(self.index))
+        os.replace(temp_file, self.index_file)
+
+    def flush(self):
+        if self.enabled:
+            with self.lock:
+                if self.dirty:
+                    self.save()
+                    self.dirty = False
+
+    def get(self, session, url, token, params=None, identity=None):
+        headers = {"Authorization": f"Bearer {token}"}
+
+        if not self.enabled:
+            return session.get(url, headers=headers, params=params)
+
+        key = self.key(url, identity or token, params)
+        response = session.get(url, headers={**headers, **self.conditional_headers(key)}, params=params)
+
+        if response.status_code == 304:
+            body, entry = self.load(key)
+            if body is None:
+                return session.get(url, headers=headers, params=params)
+
+            response.status_code = 200
+            response._content = body
+            if entry.get("link") and "Link" not in response.headers:
+                response.headers["Link"] = entry["link"]
+        elif response.status_code == 200:
+            self.store(key, response.headers, response.content)
+
+        return response
+
+caches = {}
+caches_lock = threading.Lock()
+
+def get_cache(data):
+    settings = data.get("HTTP-Cache", {})
+    directory = settings.get("directory", default_cache_directory)
+
+    with caches_lock:
+        if directory not in caches:
+            caches[directory] = HTTPCache(
+                directory,
+                settings.get("max-size-mb", default_max_size_mb),
+                settings.get("enabled", True)
+            )
+        return caches[directory]
@@ -0,0 +1,150 @@
+import json
+import re
+import threading
+from urllib.parse import urlsplit
+import requests as r
+from requests.adapters import HTTPAdapter
+
+latency_buckets = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+default_pool_size = 10
+
+id_segment = re.compile(r"^(\d+|[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}|[0-9a-f]{32}|[A-Za-z0-9_-]{20,})$")
+
+def endpoint_name(url):
+    path = urlsplit(url).path
+    return "/" + "/".join("{id}" if id_segment.match(segment) else segment for segment in path.strip("/").split("/"))
+
+def phase_name(service, method, endpoint):
+    if service != "notion":
+        return "scrape"
+    if endpoint.endswith("/query"):
+        return "list"
+    if endpoint.endswith("/search") or "/databases" in endpoint:
+        return "schema confirm"
+    if method == "POST":
+        return "create"
+    return "patch"
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def record(self, service, method, url, status, seconds, size, retries=0, wait=0.0):
+        endpoint = endpoint_name(url)
+        key = (service, method, endpoint)
+
+        with self.lock:
+            if key not in self.endpoints:
+                self.endpoints[key] = {
+                    "service": service,
+                    "method": method,
+                    "endpoint": endpoint,
+                    "phase": phase_name(service, method, endpoint),
+                    "count": 0,
+                    "errors": 0,
+                    "bytes": 0,
+                    "retries": 0,
+                    "rate_limit_wait_seconds": 0.0,
+                    "latency_seconds": 0.0,
+                    "latency_max_seconds": 0.0,
+                    "latency_buckets": [0] * (len(latency_buckets) + 1)
+                }
+
+            stats = self.endpoints[key]
+            stats["count"] += 1
+            stats["errors"] += 1 if status >= 400 else 0
+            stats["bytes"] += size
+            stats["retries"] += retries
+            stats["rate_limit_wait_seconds"] += wait
+            stats["latency_seconds"] += seconds
+            stats["latency_max_seconds"] = max(stats["latency_max_seconds"], seconds)
+            stats["latency_buckets"][next(
+                (index for index, bound in enumerate(latency_buckets) if seconds <= bound), len(latency_buckets)
+            )] += 1
+
+    def hook(self, service):
+        def record_response(response, *args, **kwargs):
+            self.record(
+                service,
+                response.request.method,
+                response.url,
+                response.status_code,
+                response.elapsed.total_seconds(),
+                len(response.content)
+            )
+        return record_response
+
+    def report(self):
+        with self.lock:
+            endpoints = [dict(stats, latency_buckets=list(stats["latency_buckets"])) for stats in self.endpoints.values()]
+
+        phases = {}
+        for stats in endpoints:
+            phase = phases.setdefault(stats["phase"], {"count": 0, "bytes": 0, "latency_seconds": 0.0, "rate_limit_wait_seconds": 0.0})
+            for key in phase:
+                phase[key] += stats[key]
+
+        return {
+            "latency_bucket_bounds": latency_buckets,
+            "phases": phases,
+            "endpoints": sorted(endpoints, key=lambda stats: (stats["service"], stats["endpoint"], stats["method"]))
+        }
+
+    def prometheus(self):
+        report = self.report()
+        endpoints = [
+            (f'service="{stats["service"]}",method="{stats["method"]}",endpoint="{stats["endpoint"]}",phase="{stats["phase"]}"', stats)
+            for stats in report["endpoints"]
+        ]
+        lines = []
+
+        for name, key, kind in [
+            ("notion_automations_requests_total", "count", "counter"),
+            ("notion_automations_request_errors_total", "errors", "counter"),
+            ("notion_automations_response_bytes_total", "bytes", "counter"),
+            ("notion_automations_retries_total", "retries", "counter"),
+            ("notion_automations_rate_limit_wait_seconds_total", "rate_limit_wait_seconds", "counter")
+        ]:
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, stats in endpoints:
+                value = f"{stats[key]:.6f}" if isinstance(stats[key], float) else stats[key]
+                lines.append(f"{name}{{{labels}}} {value}")
+
+        lines.append("# TYPE notion_automations_request_duration_seconds histogram")
+        for labels, stats in endpoints:
+            cumulative = 0
+            for bound, count in zip(latency_buckets + ["+Inf"], stats["latency_buckets"]):
+                cumulative += count
+                lines.append(f'notion_automations_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"notion_automations_request_duration_seconds_sum{{{labels}}} {stats['latency_seconds']:.6f}")
+            lines.append(f"notion_automations_request_duration_seconds_count{{{labels}}} {stats['count']}")
+
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        return ", ".join(
+            f"{phase}: {stats['count']} requests in {stats['latency_seconds']:.1f}s"
+            for phase, stats in sorted(self.report()["phases"].items())
+        )
+
+    def write(self, data):
+        settings = data.get("Metrics", {})
+
+        if settings.get("report-file"):
+            with open(settings["report-file"], "w") as f:
+                f.write(json.dumps(self.report(), indent=2))
+
+        if settings.get("prometheus-file"):
+            with open(settings["prometheus-file"], "w") as f:
+                f.write(self.prometheus())
+
+metrics = Metrics()
+
+def instrumented_session(service, pool_size=default_pool_size):
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session = r.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.hooks["response"].append(metrics.hook(service))
+    return session
@@ -1,45 +1,225 @@
 from datetime import datetime as dt, timezone
+import threading
+import time
 import requests as r
+from requests.adapters import HTTPAdapter
+from Utils.state import get_state
+from Utils.metrics import metrics
+from Utils.paginate import paginate, next_cursor
 
-def confirm_notion_database(data, expected_title, database_format, special_properties):
-    headers = {
-        "Authorization": f"Bearer {data.get('Notion').get('Notion-API-Key')}",
-        'Content-Type': 'application/json',
-        'Notion-Version': '2022-06-28'
-    }
-    
-    parent = {
-        "type": "page_id",
-        "page_id": data['Notion']["parent-page-id"]
+notion_api_url = "https://api.notion.com/v1"
+notion_version = "2022-06-28"
+default_pool_size = 10
+query_page_size = 100
+default_requests_per_second = 3
+max_retries = 5
+
+class RateLimiter:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.requests = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+    def refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.refill(now)
+            self.tokens -= 1
+            wait = (self.updated - now) + max(0, -self.tokens / self.rate)
+
+            self.requests += 1
+            self.waited += wait
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        with self.lock:
+            now = time.monotonic()
+            self.refill(now)
+            self.tokens = min(self.tokens, 0)
+            self.updated = max(self.updated, now + seconds)
+            self.throttled += 1
+
+    def report(self):
+        return f"{self.requests} requests, {self.throttled} rate limited, {self.waited:.1f}s waiting"
+
+def retry_after(response, attempt):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return 2 ** attempt
+
+class NotionClient:
+    def __init__(self, token, pool_size=default_pool_size, requests_per_second=default_requests_per_second, base_url=notion_api_url):
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.limiter = RateLimiter(requests_per_second)
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session = r.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            'Content-Type': 'application/json',
+            'Notion-Version': notion_version,
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive"
+        })
+
+    def request(self, method, path, **kwargs):
+        url = f"{self.base_url}/{path.lstrip('/')}"
+
+        for attempt in range(max_retries + 1):
+            wait = self.limiter.acquire()
+            started = time.perf_counter()
+            response = self.session.request(method, url, **kwargs)
+            metrics.record("notion", method, url, response.status_code, time.perf_counter() - started, len(response.content), 1 if attempt else 0, wait)
+
+            if response.status_code != 429 or attempt == max_retries:
+                return response
+
+            self.limiter.pause(retry_after(response, attempt))
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request("PATCH", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+clients = {}
+clients_lock = threading.Lock()
+
+def get_client(token, pool_size=default_pool_size, requests_per_second=default_requests_per_second, base_url=notion_api_url):
+    with clients_lock:
+        if token not in clients:
+            clients[token] = NotionClient(token, pool_size, requests_per_second, base_url)
+        return clients[token]
+
+def get_notion_client(data):
+    notion = data['Notion']
+    return get_client(
+        notion['Notion-API-Key'],
+        notion.get("pool-size", default_pool_size),
+        notion.get("requests-per-second", default_requests_per_second),
+        notion.get("api-url", notion_api_url)
+    )
+
+def print_rate_limit_report():
+    with clients_lock:
+        for client in clients.values():
+            print(f"Notion: {client.limiter.report()}")
+
+def property_value(prop):
+    kind = prop.get("type") or next(key for key in prop if key != "id")
+    value = prop.get(kind)
+
+    if kind == "date":
+        if not value or not value.get("start"):
+            return None
+        return dt.fromisoformat(value["start"].replace("Z", "+00:00"))
+    if kind == "select":
+        return value.get("name") if value else None
+    if kind in ["rich_text", "title"]:
+        return "".join(
+            text.get("plain_text") or text.get("text", {}).get("content", "")
+            for text in value or []
+        )
+
+    return value
+
+def property_values(properties):
+    return {name: property_value(prop) for name, prop in properties.items()}
+
+def diff_properties(desired, values):
+    return {
+        name: prop for name, prop in desired.items()
+        if name not in values or property_value(prop) != values[name]
     }
-    
-    search_request = r.post("https://api.notion.com/v1/search", headers=headers, json={
+
+def search_database(client, expected_title):
+    search_request = client.post("search", json={
         "query": expected_title,
         "filter": {
             "value": "database",
             "property": "object"
         },
     })
-    
-    id = None
-    
 
     search_request.raise_for_status()
     
     for db in search_request.json().get("results", []):
         name = db.get("title", [{}])[0].get("text", {}).get("content", {})
         if name == expected_title:
-            id = db.get("id")
-            
-            for prop in db.get("properties", {}).keys():
-                if prop in special_properties.keys():
-                    prop_names = [p['name'] for p in special_properties[prop]]
-                    for existing_item in db.get("properties", {}).get(prop, {}).get("select", {}).get("options", []):
-                        if existing_item['name'] not in prop_names:
-                            prop_names.append(existing_item['name'])
-                            special_properties[prop].append({"name": existing_item['name']})
-
-            break
+            return db
+
+    return None
+
+def get_cached_database(client, state, expected_title):
+    cached = state.get_meta(f"database:{expected_title}")
+    if not cached:
+        return None
+
+    response = client.get(f"databases/{cached['id']}")
+    if response.status_code != 200 or response.json().get("archived"):
+        return None
+
+    return response.json()
+
+def schema_set(properties):
+    schema = set()
+
+    for name, prop in properties.items():
+        kind = prop.get("type") or next(key for key in prop if key != "id")
+        schema.add((name, kind, None))
+
+        if kind == "select":
+            for option in (prop.get("select") or {}).get("options", []):
+                schema.add((name, kind, option['name']))
+
+    return schema
+
+def confirm_notion_database(data, expected_title, database_format, special_properties):
+    client = get_notion_client(data)
+    state = get_state(data)
+    
+    parent = {
+        "type": "page_id",
+        "page_id": data['Notion']["parent-page-id"]
+    }
+    
+    db = get_cached_database(client, state, expected_title) or search_database(client, expected_title)
+    id = None
+
+    if db:
+        id = db.get("id")
+        
+        for prop in db.get("properties", {}).keys():
+            if prop in special_properties.keys():
+                prop_names = [p['name'] for p in special_properties[prop]]
+                for existing_item in db.get("properties", {}).get(prop, {}).get("select", {}).get("options", []):
+                    if existing_item['name'] not in prop_names:
+                        prop_names.append(existing_item['name'])
+                        special_properties[prop].append({"name": existing_item['name']})
 
     
     for prop in special_properties.keys():
@@ -57,20 +237,14 @@ def confirm_notion_database(data, expected_title, database_format, special_prope
             }
         ]
         
-        created_db_response = r.post(
-            "https://api.notion.com/v1/databases",
-            headers=headers,
-            json=database_format
-        )
+        created_db_response = client.post("databases", json=database_format)
         created_db_response.raise_for_status()
         id = created_db_response.json().get("id")
         properties = created_db_response.json()['properties']
+    elif schema_set(database_format["properties"]) <= schema_set(db["properties"]):
+        properties = db["properties"]
     else:
-        updated_db_response = r.patch(
-            f"https://api.notion.com/v1/databases/{id}",
-            headers=headers,
-            json=database_format
-        )
+        updated_db_response = client.patch(f"databases/{id}", json=database_format)
         
         if updated_db_response.status_code != 200:
             print(updated_db_response.text)
@@ -78,18 +252,50 @@ def confirm_notion_database(data, expected_title, database_format, special_prope
         updated_db_response.raise_for_status()
         properties = updated_db_response.json()['properties']
 
+    state.set_meta(f"database:{expected_title}", {"id": id})
+
     return (id, properties)
 
-def list_db_items(id, token):
-    response = r.post(
-        "https://api.notion.com/v1/databases/{}/query".format(id),
-        headers = {
-            "Authorization": f"Bearer {token}",
-            'Content-Type': 'application/json',
-            'Notion-Version': '2022-06-28'
+def add_select_options(data, database_id, properties, prop, names):
+    options = properties[prop]["select"].get("options", [])
+    known = {option['name'] for option in options}
+    new_options = [{"name": name} for name in sorted(set(names) - known)]
+
+    if not new_options:
+        return properties
+
+    response = get_notion_client(data).patch(f"databases/{database_id}", json={
+        "properties": {
+            prop: {
+                "select": {
+                    "options": options + new_options
+                }
+            }
         }
-    )
-    
+    })
+
+    if response.status_code != 200:
+        print(response.text)
     response.raise_for_status()
-    
-    return response.json().get("results", [])
\ No newline at end of file
+
+    return response.json()['properties']
+
+def property_ids(properties, names):
+    return [properties[name]['id'] for name in names if name in properties]
+
+def list_db_items(id, token, properties=None, filter=None, sorts=None):
+    client = get_client(token)
+    params = [("filter_properties", prop) for prop in properties] if properties else None
+    body = {"page_size": query_page_size}
+
+    if filter:
+        body["filter"] = filter
+    if sorts:
+        body["sorts"] = sorts
+
+    def query(body):
+        response = client.post(f"databases/{id}/query", params=params, json=body)
+        response.raise_for_status()
+        return response.json()
+
+    return paginate(query, body, next_cursor, lambda page: page.get("results", []))
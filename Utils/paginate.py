@@ -0,0 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+
+def paginate(fetch, request, next_request, items):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(fetch, request)
+
+        while future:
+            page = future.result()
+            request = next_request(page, request)
+            future = executor.submit(fetch, request) if request else None
+            yield from items(page)
+
+def next_link(response, request):
+    url = response.links.get("next", {}).get("url")
+    return (url, None) if url else None
+
+def next_page_token(page, params):
+    token = page.get("nextPageToken")
+    return {**params, "pageToken": token} if token else None
+
+def next_cursor(page, body):
+    return {**body, "start_cursor": page["next_cursor"]} if page.get("has_more") else None
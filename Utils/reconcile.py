@@ -0,0 +1,243 @@
+from datetime import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+import json
+from Utils.notion import get_notion_client, list_db_items, property_ids, diff_properties, property_value, property_values
+from Utils.state import get_state, content_hash, verify_interval
+
+default_batch_size = 10
+
+class Plan:
+    def __init__(self):
+        self.create = []
+        self.update = []
+        self.skip = []
+        self.archive = []
+
+def parse_time(value):
+    return dt.fromisoformat(value.replace("Z", "+00:00"))
+
+def text_property(content, kind="rich_text"):
+    return {
+        kind: [
+            {
+                "text": {
+                    "content": content
+                }
+            }
+        ]
+    }
+
+def create_properties(record, id_property):
+    properties = {
+        "Name": text_property(record.name, "title"),
+        "Due Date": {
+            "date": {
+                "start": parse_time(record.due_at).isoformat(timespec='milliseconds'),
+                "end": None,
+                "time_zone": None
+            }
+        },
+        "Status": {
+            "select": {
+                "name": record.status
+            }
+        },
+        "Course": {
+            "select": {
+                "name": record.course
+            }
+        },
+        id_property: text_property(record.id),
+        "Link": {
+            "url": record.url
+        }
+    }
+
+    if record.description is not None:
+        properties["Description"] = text_property(record.description)
+
+    return properties
+
+def update_properties(record):
+    properties = {
+        "Due Date": {
+            "date": {
+                "start": parse_time(record.due_at).isoformat(timespec='milliseconds'),
+                "end": None,
+                "time_zone": None
+            }
+        },
+        "Link": {
+            "url": record.url
+        }
+    }
+
+    if record.status in ["Graded", "Submitted"]:
+        properties["Status"] = {
+            "select": {
+                "name": record.status
+            }
+        }
+
+    return properties
+
+def id_filter(id_properties):
+    conditions = [{"property": id_property, "rich_text": {"is_not_empty": True}} for id_property in id_properties]
+    return conditions[0] if len(conditions) == 1 else {"or": conditions}
+
+def existing_pages(data, database_id, id_properties, base_properties, window_start=None):
+    state = get_state(data)
+    interval = verify_interval(data)
+    stale = [source for source in id_properties if state.needs_verify(source, interval)]
+
+    existing = {
+        source: {
+            source_id: (page_id, None, stored_hash)
+            for source_id, (page_id, stored_hash) in state.get_pages(source).items()
+        } for source in id_properties if source not in stale
+    }
+
+    if stale:
+        query_filter = id_filter([id_properties[source] for source in stale])
+        if window_start:
+            query_filter = {"and": [query_filter, {"property": "Due Date", "date": {"on_or_after": window_start.isoformat()}}]}
+
+        items = list_db_items(
+            database_id,
+            data['Notion']['Notion-API-Key'],
+            property_ids(base_properties, [id_properties[source] for source in stale] + ["Status", "Due Date", "Link"]),
+            query_filter
+        )
+
+        for source in stale:
+            existing[source] = {}
+
+        for item in items:
+            values = property_values(item['properties'])
+            for source in stale:
+                source_id = values.get(id_properties[source])
+                if source_id:
+                    existing[source][source_id] = (item['id'], values, None)
+
+        for source in stale:
+            state.replace_pages(source, {
+                source_id: (page_id, None) for source_id, (page_id, _, _) in existing[source].items()
+            })
+
+    return existing, stale
+
+def expired_pages(data, database_id, id_properties, base_properties, cutoff):
+    expired = {source: Plan() for source in id_properties}
+
+    items = list_db_items(
+        database_id,
+        data['Notion']['Notion-API-Key'],
+        property_ids(base_properties, list(id_properties.values())),
+        {"and": [
+            {"property": "Status", "select": {"equals": "Graded"}},
+            {"property": "Due Date", "date": {"before": cutoff.isoformat()}},
+            id_filter(list(id_properties.values()))
+        ]},
+        [{"property": "Due Date", "direction": "ascending"}]
+    )
+
+    for item in items:
+        properties = item['properties']
+
+        for source, id_property in id_properties.items():
+            source_id = property_value(properties[id_property]) if id_property in properties else None
+            if source_id:
+                expired[source].archive.append((source_id, item['id']))
+                break
+
+    return expired
+
+def plan(records, existing):
+    result = Plan()
+    seen = set()
+
+    for record in records:
+        if record.id in seen:
+            continue
+        seen.add(record.id)
+
+        if record.id not in existing:
+            if record.creatable:
+                result.create.append(record)
+            continue
+
+        page_id, page_values, stored_hash = existing[record.id]
+        desired = update_properties(record)
+        desired_hash = content_hash(desired)
+
+        if page_values is None:
+            properties = desired if desired_hash != stored_hash else {}
+        else:
+            properties = diff_properties(desired, page_values)
+
+        if properties:
+            result.update.append((record.id, page_id, properties, desired_hash))
+        else:
+            result.skip.append((record.id, page_id, desired_hash, stored_hash))
+
+    return result
+
+def execute(plan, data, database_id, source, id_property):
+    client = get_notion_client(data)
+    state = get_state(data)
+    batch_size = data['Notion'].get("batch-size", default_batch_size)
+
+    def create(record):
+        properties = create_properties(record, id_property)
+        response = client.post(
+            "pages",
+            json = {
+                "parent": {
+                    "database_id": database_id
+                },
+                "properties": properties
+            }
+        )
+
+        if response.status_code != 200:
+            print(response.text)
+            print(json.dumps(properties, indent=4))
+        response.raise_for_status()
+        page_id = response.json()['id']
+        state.set_page(source, record.id, page_id, content_hash(update_properties(record)))
+        return record.id, page_id
+
+    def update(item):
+        source_id, page_id, properties, desired_hash = item
+        response = client.patch(f"pages/{page_id}", json={"properties": properties})
+
+        if response.status_code == 404:
+            state.delete_page(source, source_id)
+        elif response.status_code != 200:
+            print(response.text)
+        else:
+            state.set_page(source, source_id, page_id, desired_hash)
+
+    def archive(item):
+        source_id, page_id = item
+        response = client.patch(f"pages/{page_id}", json={"archived": True})
+
+        if response.status_code in [200, 404]:
+            state.delete_page(source, source_id)
+        else:
+            print(response.text)
+
+    for source_id, page_id, desired_hash, stored_hash in plan.skip:
+        if desired_hash != stored_hash:
+            state.set_page(source, source_id, page_id, desired_hash)
+
+    created = {}
+
+    with ThreadPoolExecutor(max_workers=batch_size) as executor:
+        for action, items in [(create, plan.create), (update, plan.update), (archive, plan.archive)]:
+            for start in range(0, len(items), batch_size):
+                results = list(executor.map(action, items[start:start + batch_size]))
+                if action is create:
+                    created.update(results)
+
+    return created
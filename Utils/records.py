@@ -0,0 +1,55 @@
+import io
+import json
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+class TaskRecord:
+    __slots__ = ("id", "name", "due_at", "course", "url", "status", "description", "creatable")
+
+    def __init__(self, id, name, due_at, course, url, status=None, description=None, creatable=False):
+        self.id = id
+        self.name = name
+        self.due_at = due_at
+        self.course = course
+        self.url = url
+        self.status = status
+        self.description = description
+        self.creatable = creatable
+
+def iter_items(content, prefix="item"):
+    if ijson:
+        yield from ijson.items(io.BytesIO(content), prefix, use_float=True)
+        return
+
+    data = json.loads(content)
+    for key in prefix.split(".")[:-1]:
+        data = data.get(key, [])
+    yield from data
+
+def read_page(content, items_key, token_key="nextPageToken"):
+    if not ijson:
+        return json.loads(content)
+
+    item_prefix = f"{items_key}.item"
+    page = {items_key: [], token_key: None}
+    builder = None
+
+    for prefix, event, value in ijson.parse(io.BytesIO(content), use_float=True):
+        if builder:
+            builder.event(event, value)
+            if prefix == item_prefix and event in ("end_map", "end_array"):
+                page[items_key].append(builder.value)
+                builder = None
+        elif prefix == item_prefix:
+            if event in ("start_map", "start_array"):
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+            else:
+                page[items_key].append(value)
+        elif prefix == token_key:
+            page[token_key] = value
+
+    return page
@@ -0,0 +1,44 @@
+expected_title = "School Tasks"
+
+id_properties = {
+    "Canvas": "Canvas-Assignment-ID",
+    "Google_Classroom": "Google_Classroom_Assignment_Id"
+}
+
+status_options = [
+    {"name": "Not started", "color": "red"},
+    {"name": "In progress", "color": "yellow"},
+    {"name": "Submitted", "color": "blue"},
+    {"name": "Graded", "color": "green"}
+]
+
+database_format = {
+    "properties": {
+        "Name": {
+            "title": {}
+        },
+        "Due Date": {
+            "date": {}
+        },
+        "Description": {
+            "rich_text": {}
+        },
+        "Status": {
+            "select": {
+                "options": status_options
+            }
+        },
+        "Course": {
+            "select": {
+                "options": [
+                ]
+            }
+        },
+        "Canvas-Assignment-ID": {
+            "rich_text": {}
+        },
+        "Link": {
+            "url": {}
+        }
+    }
+}
@@ -0,0 +1,130 @@
+import sqlite3
+import threading
+import hashlib
+import json
+import time
+
+default_state_file = "sync_state.db"
+default_verify_interval_hours = 24
+
+class SyncState:
+    def __init__(self, filename=default_state_file):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.source_locks = {}
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+
+        with self.lock, self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    source TEXT NOT NULL,
+                    source_id TEXT NOT NULL,
+                    page_id TEXT NOT NULL,
+                    content_hash TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (source, source_id)
+                )
+            """)
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS texts (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    used_at REAL
+                )
+            """)
+            if "used_at" not in [row[1] for row in self.connection.execute("PRAGMA table_info(texts)")]:
+                self.connection.execute("ALTER TABLE texts ADD COLUMN used_at REAL")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+
+    def get_pages(self, source):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT source_id, page_id, content_hash FROM pages WHERE source = ?", (source,)
+            ).fetchall()
+        return {source_id: (page_id, content_hash) for source_id, page_id, content_hash in rows}
+
+    def set_page(self, source, source_id, page_id, content_hash):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                (source, source_id, page_id, content_hash, time.time())
+            )
+
+    def delete_page(self, source, source_id):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM pages WHERE source = ? AND source_id = ?", (source, source_id))
+
+    def replace_pages(self, source, pages):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM pages WHERE source = ?", (source,))
+            self.connection.executemany(
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?)",
+                [(source, source_id, page_id, content_hash, time.time()) for source_id, (page_id, content_hash) in pages.items()]
+            )
+
+    def get_texts(self, keys):
+        texts = {}
+
+        with self.lock, self.connection:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ', '.join('?' for _ in chunk)
+                texts.update(self.connection.execute(
+                    f"SELECT key, value FROM texts WHERE key IN ({placeholders})", chunk
+                ).fetchall())
+                self.connection.execute(f"UPDATE texts SET used_at = ? WHERE key IN ({placeholders})", [time.time(), *chunk])
+
+        return texts
+
+    def set_texts(self, texts, limit=None):
+        with self.lock, self.connection:
+            now = time.time()
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO texts VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in texts.items()]
+            )
+            if limit is not None:
+                self.connection.execute(
+                    "DELETE FROM texts WHERE key NOT IN (SELECT key FROM texts ORDER BY used_at DESC LIMIT ?)", (limit,)
+                )
+
+    def get_meta(self, key, default=None):
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+
+    def needs_verify(self, source, interval_hours):
+        verified_at = self.get_meta(f"{source}:verified-at", 0)
+        return time.time() - verified_at >= interval_hours * 3600
+
+    def mark_verified(self, source):
+        self.set_meta(f"{source}:verified-at", time.time())
+
+    def source_lock(self, source):
+        with self.lock:
+            return self.source_locks.setdefault(source, threading.Lock())
+
+def content_hash(properties):
+    return hashlib.sha256(json.dumps(properties, sort_keys=True, default=str).encode()).hexdigest()
+
+states = {}
+states_lock = threading.Lock()
+
+def get_state(data):
+    filename = data['Notion'].get("state-file", default_state_file)
+    with states_lock:
+        if filename not in states:
+            states[filename] = SyncState(filename)
+        return states[filename]
+
+def verify_interval(data):
+    return data['Notion'].get("verify-interval-hours", default_verify_interval_hours)
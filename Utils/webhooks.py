@@ -0,0 +1,178 @@
+import base64
+import copy
+import hmac
+import json
+import threading
+import time
+import traceback
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from Utils.writer import NotionWriter
+
+default_host = "127.0.0.1"
+default_port = 8787
+default_debounce_seconds = 5
+
+canvas_events = ["assignment_created", "assignment_updated", "submission_created", "submission_updated", "grade_change"]
+
+def canvas_target(event):
+    metadata = event.get("metadata", {})
+    body = event.get("body", {})
+
+    if metadata.get("event_name") not in canvas_events:
+        return None
+
+    course_id = body.get("context_id") if body.get("context_type") == "Course" else metadata.get("context_id")
+    assignment_id = body.get("assignment_id")
+
+    if not course_id or not assignment_id:
+        return None
+    return str(course_id), str(assignment_id)
+
+def classroom_target(push):
+    message = push.get("message", {})
+    notification = json.loads(base64.b64decode(message.get("data", "")) or "{}")
+    resource = notification.get("resourceId", {})
+    collection = notification.get("collection")
+
+    if collection == "courses.courseWork":
+        course_work_id = resource.get("id")
+    elif collection == "courses.courseWork.studentSubmissions":
+        course_work_id = resource.get("courseWorkId")
+    else:
+        return None
+
+    if not resource.get("courseId") or not course_work_id:
+        return None
+    return resource["courseId"], course_work_id
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        receiver = self.server.receiver
+        url = urlsplit(self.path)
+        segments = url.path.strip("/").split("/")
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        if receiver.secret and not hmac.compare_digest(parse_qs(url.query).get("token", [""])[0].encode(), receiver.secret.encode()):
+            return self.respond(403)
+
+        try:
+            event = json.loads(body)
+            if not isinstance(event, dict):
+                return self.respond(400)
+
+            if segments[0] == "canvas" and len(segments) <= 2:
+                target = canvas_target(event)
+                if target:
+                    receiver.add("Canvas", int(segments[1]) if len(segments) == 2 else 0, *target)
+            elif segments == ["classroom"]:
+                target = classroom_target(event)
+                if target:
+                    receiver.add("Google_Classroom", None, *target)
+            else:
+                return self.respond(404)
+        except (ValueError, AttributeError, TypeError):
+            return self.respond(400)
+
+        self.respond(204)
+
+class WebhookReceiver:
+    def __init__(self, config, stop_event, classroom_auth=None):
+        with config.lock:
+            settings = config.get_data().get("Webhooks", {})
+
+        self.config = config
+        self.stop_event = stop_event
+        self.classroom_auth = classroom_auth
+        self.secret = settings.get("secret")
+        self.debounce = settings.get("debounce-seconds", default_debounce_seconds)
+        self.pending = {}
+        self.lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer((settings.get("host", default_host), settings.get("port", default_port)), Handler)
+        self.server.daemon_threads = True
+        self.server.receiver = self
+
+    def add(self, source, instance, course_id, item_id):
+        with self.lock:
+            item_ids, _ = self.pending.get((source, instance, course_id), (set(), None))
+            item_ids.add(item_id)
+            self.pending[(source, instance, course_id)] = (item_ids, time.monotonic())
+
+    def due(self, everything=False):
+        now = time.monotonic()
+
+        with self.lock:
+            ready = {
+                target: item_ids for target, (item_ids, updated) in self.pending.items()
+                if everything or now - updated >= self.debounce
+            }
+            for target in ready:
+                del self.pending[target]
+
+        return ready
+
+    def flush(self, targets):
+        import Canvas.main as canvas
+        import Google_Classroom.main as classroom
+
+        with self.config.lock:
+            data = copy.deepcopy(self.config.get_data())
+
+        modules = {"Canvas": canvas, "Google_Classroom": classroom}
+        writer = NotionWriter(data, {
+            module.integration_title: module.id_property
+            for source, module in modules.items() if any(target[0] == source for target in targets)
+        }).start()
+
+        try:
+            for (source, instance, course_id), item_ids in targets.items():
+                print(f"Webhook re-sync of {len(item_ids)} {source} item(s) in course {course_id}")
+
+                try:
+                    if source == "Canvas":
+                        canvas.sync_assignments(data['Canvas'][instance], course_id, item_ids, data, writer)
+                    else:
+                        if self.classroom_auth:
+                            token, identity = self.classroom_auth
+                        else:
+                            creds = classroom.get_credentials(data)
+                            token, identity = creds.token, creds.refresh_token
+                        classroom.sync_course_work(data, token, identity, course_id, item_ids, writer)
+                except Exception as e:
+                    print(f"Error in {source} webhook re-sync: {e}")
+                    traceback.print_exc()
+        finally:
+            writer.close()
+
+    def run(self):
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        print(f"Listening for webhooks on {self.server.server_address[0]}:{self.server.server_address[1]}")
+
+        while True:
+            stopping = self.stop_event.wait(min(1, self.debounce))
+            targets = self.due(stopping)
+
+            if targets:
+                try:
+                    self.flush(targets)
+                except Exception as e:
+                    print(f"Error in webhook re-sync: {e}")
+                    traceback.print_exc()
+
+            if stopping:
+                break
+
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,161 @@
+import copy
+from datetime import datetime as dt, timedelta, timezone
+import queue
+import threading
+import traceback
+from collections import Counter
+from Utils.notion import confirm_notion_database, add_select_options
+from Utils.reconcile import Plan, existing_pages, expired_pages, plan, execute, parse_time
+from Utils.schema import database_format, expected_title, status_options
+from Utils.state import get_state, verify_interval
+
+default_queue_size = 8
+
+class NotionWriter:
+    def __init__(self, data, id_properties):
+        self.data = data
+        self.id_properties = id_properties
+        self.queue = queue.Queue(maxsize=data['Notion'].get("writer-queue-size", default_queue_size))
+        self.thread = None
+        self.error = None
+        self.finished = False
+        self.counts = {source: Counter() for source in id_properties}
+
+        window_days = data['Notion'].get("sync-window-days")
+        self.window_start = dt.now(timezone.utc) - timedelta(days=window_days) if window_days is not None else None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run)
+        self.thread.start()
+        return self
+
+    def submit(self, source, records, courses=(), prepare=None):
+        self.queue.put((source, records, courses, prepare))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+        if self.error:
+            raise self.error
+
+    def confirm(self):
+        schema = copy.deepcopy(database_format)
+        for id_property in self.id_properties.values():
+            schema['properties'].setdefault(id_property, {"rich_text": {}})
+
+        return confirm_notion_database(self.data, expected_title, schema, {
+            "Course": [],
+            "Status": copy.deepcopy(status_options)
+        })
+
+    def batches(self):
+        while not self.finished:
+            item = self.queue.get()
+            if item is None:
+                self.finished = True
+                return
+
+            items = [item]
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.finished = True
+                    break
+                items.append(item)
+
+            yield items
+
+    def write(self, source, submissions):
+        existing = self.existing[source]
+        records = [record for item_records, _ in submissions for record in item_records]
+        if self.window_start:
+            records = [record for record in records if parse_time(record.due_at) >= self.window_start]
+
+        result = plan(records, existing)
+
+        for item_records, prepare in submissions:
+            if prepare:
+                submitted = {id(record) for record in item_records}
+                part = Plan()
+                part.create = [record for record in result.create if id(record) in submitted]
+                prepare(part)
+
+        created = execute(result, self.data, self.database_id, source, self.id_properties[source])
+        for source_id, page_id in created.items():
+            existing[source_id] = (page_id, None, None)
+
+        self.counts[source].update({
+            "created": len(result.create),
+            "updated": len(result.update),
+            "skipped": len(result.skip)
+        })
+
+    def archive_expired(self):
+        retention_days = self.data['Notion'].get("retention-days")
+        state = get_state(self.data)
+
+        if retention_days is None:
+            return
+
+        interval = verify_interval(self.data)
+        due = {
+            source: id_property for source, id_property in self.id_properties.items()
+            if state.needs_verify(f"{source}:retention", interval)
+        }
+        if not due:
+            return
+
+        cutoff = dt.now(timezone.utc) - timedelta(days=retention_days)
+        expired = expired_pages(self.data, self.database_id, due, self.properties, cutoff)
+
+        for source, result in expired.items():
+            execute(result, self.data, self.database_id, source, self.id_properties[source])
+            for source_id, _ in result.archive:
+                self.existing[source].pop(source_id, None)
+            self.counts[source]["archived"] += len(result.archive)
+            state.mark_verified(f"{source}:retention")
+
+    def run(self):
+        locks = []
+
+        try:
+            locks = [get_state(self.data).source_lock(source) for source in sorted(self.id_properties)]
+            for lock in locks:
+                lock.acquire()
+
+            self.database_id, self.properties = self.confirm()
+            self.existing, verified = existing_pages(self.data, self.database_id, self.id_properties, self.properties, self.window_start)
+
+            for items in self.batches():
+                courses = {course for _, _, item_courses, _ in items for course in item_courses}
+                self.properties = add_select_options(self.data, self.database_id, self.properties, "Course", courses)
+
+                for source in self.id_properties:
+                    submissions = [(item_records, prepare) for item_source, item_records, _, prepare in items if item_source == source]
+
+                    if any(item_records for item_records, _ in submissions):
+                        self.write(source, submissions)
+
+            for source in verified:
+                get_state(self.data).mark_verified(source)
+
+            self.archive_expired()
+
+        except Exception as e:
+            print(f"Error in Notion writer: {e}")
+            traceback.print_exc()
+            self.error = e
+
+            while not self.finished:
+                self.finished = self.queue.get() is None
+
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+        for source, counts in self.counts.items():
+            print(f"{source}: created {counts['created']}, updated {counts['updated']}, skipped {counts['skipped']}, archived {counts['archived']} pages")
@@ -1,7 +1,18 @@
 import os
+import sys
 import threading
 import importlib
 import json
+import copy
+import random
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from Utils.notion import get_notion_client, print_rate_limit_report
+from Utils.metrics import metrics
+from Utils.writer import NotionWriter
+from Utils.schema import id_properties
+from Utils.webhooks import WebhookReceiver
 
 base_notion_config = {
     "Notion-API-Key": None,
@@ -10,6 +21,10 @@ base_notion_config = {
 
 nullable_keys = []
 
+default_interval_seconds = 1800
+default_jitter_seconds = 60
+default_tenant_workers = 4
+
 stop_event = threading.Event()
 
 ignored_automatons = [
@@ -54,32 +69,218 @@ def check_config(config):
                 config.write_data()
                 raise Exception("Notion Configuration is Incomplete")
 
-def main():
-    threads = []
-    config = Config()
-    check_config(config)
-    
-    for integration in os.listdir():
+class Integration:
+    def __init__(self, name, module_name):
+        self.name = name
+        self.module_name = module_name
+        self.module = None
+        self.import_seconds = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        with self.lock:
+            if self.module is None:
+                started = time.perf_counter()
+                self.module = importlib.import_module(self.module_name)
+                self.import_seconds = time.perf_counter() - started
+        return self.module
+
+    def run(self, stop_event, config):
+        self.load().main(stop_event, config)
+
+    def produce(self, stop_event, config, writer):
+        self.load().produce(stop_event, config, writer)
+
+def available_integrations():
+    integrations = []
+
+    for integration in sorted(os.listdir()):
         dirpath = os.path.join(".", integration)
         
-        if not config.get_data().get(integration):
-            continue
-        
         if not os.path.isdir(dirpath) or not os.path.exists(os.path.join(dirpath, "main.py")) or integration in ignored_automatons:
             continue
         
         filename = os.path.join(dirpath, "main.py")[2:]
         module_name = filename.replace(".py", "").replace("/", ".").replace("\\", ".")
-        module = importlib.import_module(module_name)
-        threads.append(threading.Thread(target=module.main, args=(stop_event, config)))
+        integrations.append(Integration(integration, module_name))
+
+    return integrations
+
+def discover_integrations(config):
+    return [integration for integration in available_integrations() if config.get_data().get(integration.name)]
+
+def tenant_files(config):
+    if "--tenants" in sys.argv:
+        paths = sys.argv[sys.argv.index("--tenants") + 1:]
+    else:
+        paths = config.get_data().get("Tenants", {}).get("paths", [])
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".json"))
+        else:
+            files.append(path)
+
+    return files
+
+def tenant_config(filename):
+    config = Config(filename)
+    name = os.path.splitext(filename)[0]
+    data = config.get_data()
+
+    if isinstance(data.get("Notion"), dict):
+        data["Notion"].setdefault("state-file", f"{name}.sync_state.db")
+    if isinstance(data.get("Google_Classroom"), dict):
+        data["Google_Classroom"].setdefault("token_file", f"{name}.token")
+
+    return config
+
+def sync_tenant(filename, integrations, tenant_stop_event):
+    started = time.perf_counter()
+    config = tenant_config(filename)
+    check_config(config)
+
+    with config.lock:
+        data = copy.deepcopy(config.get_data())
+
+    client = get_notion_client(data)
+    requests_before = client.limiter.requests
+    producers = [integration for integration in integrations if data.get(integration.name)]
+
+    writer = NotionWriter(data, {integration.name: id_properties[integration.name] for integration in producers}).start()
+    threads = [threading.Thread(target=integration.produce, args=(tenant_stop_event, config, writer)) for integration in producers]
 
     try:
-        
         for thread in threads:
             thread.start()
-            
         for thread in threads:
             thread.join()
+    finally:
+        writer.close()
+
+    tasks = sum(sum(counts.values()) for counts in writer.counts.values())
+    return tasks, client.limiter.requests - requests_before, time.perf_counter() - started
+
+def run_tenants(config):
+    files = tenant_files(config)
+    integrations = [integration for integration in available_integrations() if integration.name in id_properties]
+    max_workers = config.get_data().get("Tenants", {}).get("max-workers", default_tenant_workers)
+    tenant_stop_events = {filename: threading.Event() for filename in files}
+    started = time.perf_counter()
+    total_tasks = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(sync_tenant, filename, integrations, tenant_stop_events[filename]): filename
+            for filename in files
+        }
+
+        try:
+            for future in as_completed(futures):
+                filename = futures[future]
+                try:
+                    tasks, requests, elapsed = future.result()
+                except Exception as e:
+                    print(f"Tenant {filename} failed: {e}")
+                    traceback.print_exc()
+                    continue
+
+                total_tasks += tasks
+                print(f"Tenant {filename}: {tasks} tasks, {requests} Notion requests in {elapsed:.1f}s ({tasks / max(elapsed, 0.001):.1f} tasks/s)")
+        except KeyboardInterrupt:
+            for tenant_stop_event in tenant_stop_events.values():
+                tenant_stop_event.set()
+            raise
+
+    elapsed = time.perf_counter() - started
+    print(f"Synced {len(files)} tenants, {total_tasks} tasks in {elapsed:.1f}s ({total_tasks / max(elapsed, 0.001):.1f} tasks/s)")
+
+    print_import_report(integrations)
+    print_rate_limit_report()
+    print(f"Requests by phase: {metrics.summary()}")
+    write_metrics(config)
+
+def print_import_report(integrations):
+    loaded = [integration for integration in integrations if integration.import_seconds is not None]
+    if loaded:
+        print("Import times: " + ", ".join(f"{integration.name} {integration.import_seconds:.2f}s" for integration in loaded))
+
+def write_metrics(config):
+    with config.lock:
+        data = config.get_data()
+
+    try:
+        metrics.write(data)
+    except OSError as e:
+        print(f"Could not write metrics: {e}")
+
+def run_periodically(integration, stop_event, config):
+    with config.lock:
+        settings = config.get_data().get("Daemon", {})
+
+    interval = settings.get("intervals", {}).get(integration.name, settings.get("default-interval-seconds", default_interval_seconds))
+    jitter = settings.get("jitter-seconds", default_jitter_seconds)
+
+    while not stop_event.is_set():
+        started = time.monotonic()
+
+        try:
+            integration.run(stop_event, config)
+        except Exception as e:
+            print(f"Error in {integration.name} integration: {e}")
+            traceback.print_exc()
+
+        write_metrics(config)
+
+        delay = max(0, interval - (time.monotonic() - started)) + random.uniform(0, jitter)
+        print(f"Next {integration.name} sync in {delay:.0f}s")
+        stop_event.wait(delay)
+
+def main():
+    threads = []
+    config = Config()
+
+    if "--tenants" in sys.argv or "Tenants" in config.get_data():
+        return run_tenants(config)
+
+    check_config(config)
+
+    with config.lock:
+        get_notion_client(config.get_data())
+        daemon = "--daemon" in sys.argv or config.get_data().get("Daemon", {}).get("enabled", False)
+    
+    integrations = discover_integrations(config)
+    writer = None
+
+    if not daemon and config.get_data()["Notion"].get("single-writer", True):
+        producers = [integration for integration in integrations if integration.name in id_properties]
+
+        if producers:
+            writer = NotionWriter(
+                copy.deepcopy(config.get_data()),
+                {integration.name: id_properties[integration.name] for integration in producers}
+            ).start()
+
+    if daemon and config.get_data().get("Webhooks", {}).get("enabled", False):
+        threads.append(threading.Thread(target=WebhookReceiver(config, stop_event).run))
+
+    for integration in integrations:
+        if daemon:
+            threads.append(threading.Thread(target=run_periodically, args=(integration, stop_event, config)))
+        elif writer and integration.name in id_properties:
+            threads.append(threading.Thread(target=integration.produce, args=(stop_event, config, writer)))
+        else:
+            threads.append(threading.Thread(target=integration.run, args=(stop_event, config)))
+
+    try:
+        
+        for thread in threads:
+            thread.start()
+            
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
             
     except (KeyboardInterrupt, Exception) as e:
         stop_event.set()
@@ -87,6 +288,17 @@ def main():
         for thread in threads:
             thread.join()
 
+    if writer:
+        try:
+            writer.close()
+        except Exception as e:
+            print(f"Error writing to Notion: {e}")
+
+    print_import_report(integrations)
+    print_rate_limit_report()
+    print(f"Requests by phase: {metrics.summary()}")
+    write_metrics(config)
+
 
 if __name__ == "__main__":
     main()